@@ -0,0 +1,76 @@
+import os
+from datetime import datetime
+from database import chat_collection
+from chatbot import llm, stripThinking
+import llm_gateway
+
+# Saved chats get a placeholder name (database.saveTheChat); this worker titles
+# up to CHAT_NAMER_BATCH pending chats per run, one isolated, memory-free LLM
+# call at a time at background priority, and writes the titles back, so /reset
+# never waits on the model. Each title takes its own gateway slot, so a
+# farmer's question can go ahead of the rest of the run.
+CHAT_NAMER_BATCH = int(os.environ.get("CHAT_NAMER_BATCH", 8))
+CHAT_NAMER_INTERVAL_SECONDS = int(os.environ.get("CHAT_NAMER_INTERVAL_SECONDS", 30))
+CHAT_NAMER_MAX_ATTEMPTS = int(os.environ.get("CHAT_NAMER_MAX_ATTEMPTS", 3))
+# Only the start of a conversation is sent to the model
+CHAT_NAMER_TRANSCRIPT_CHARS = int(os.environ.get("CHAT_NAMER_TRANSCRIPT_CHARS", 1500))
+
+
+def _transcript(messages):
+    lines = []
+    for message in messages:
+        if message.get("text"):
+            speaker = "Farmer" if message.get("type") == "user" else "Assistant"
+            lines.append(f"{speaker}: {message['text']}")
+    return "\n".join(lines)[:CHAT_NAMER_TRANSCRIPT_CHARS]
+
+
+def _prompt(messages):
+    return (
+        "Give a short title (at most 8 words) for the following conversation between a farmer and a "
+        "crop assistant. Reply with the title only, on one line.\n\n"
+        f"{_transcript(messages)}"
+    )
+
+
+def _clean_title(text):
+    lines = [line.strip() for line in stripThinking(text).splitlines() if line.strip()]
+    if not lines:
+        return None
+    title = lines[0].strip("#*\"' ").removeprefix("Title:").strip()
+    return title[:80] or None
+
+
+def name_pending_chats(limit=None):
+    """Title up to `limit` chats still carrying a placeholder name. Returns the number titled."""
+    pending = list(chat_collection.find(
+        {"name_pending": True}, {"messages": 1, "name_attempts": 1}
+    ).sort("created_at", 1).limit(limit or CHAT_NAMER_BATCH))
+    if not pending:
+        return 0
+    started = datetime.now()
+    named = 0
+    for chat in pending:
+        try:
+            reply = llm_gateway.run(llm_gateway.BACKGROUND, llm.invoke, _prompt(chat.get("messages", [])))
+        except llm_gateway.LLMBusy as e:
+            print(f"Chat naming deferred: {e}")
+            break
+        except Exception as e:
+            reply = e
+        title = None if isinstance(reply, Exception) else _clean_title(reply.content)
+        if title:
+            chat_collection.update_one(
+                {"_id": chat["_id"]}, {"$set": {"name": title, "name_pending": False}}
+            )
+            named += 1
+            continue
+        attempts = chat.get("name_attempts", 0) + 1
+        print(f"Could not name chat {chat['_id']} (attempt {attempts}): {reply if isinstance(reply, Exception) else 'empty title'}")
+        # Give up after a few tries and keep the placeholder
+        chat_collection.update_one(
+            {"_id": chat["_id"]},
+            {"$set": {"name_attempts": attempts, "name_pending": attempts < CHAT_NAMER_MAX_ATTEMPTS}}
+        )
+    print(f"Named {named}/{len(pending)} chats in {datetime.now() - started}")
+    return named
@@ -0,0 +1,164 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from langchain.memory import ConversationBufferMemory
+from database import chat_session_collection, chat_collection
+from bson import ObjectId
+from langchain.schema import AIMessage, HumanMessage, messages_from_dict, messages_to_dict
+
+# One conversation memory and report context per chat session, instead of a
+# single process-wide memory. Sessions are kept in an LRU map bounded by count
+# and approximate size; idle or overflowing sessions are dropped from memory
+# and rehydrated from MongoDB (ChatSessions, or the saved chat the session id
+# names) the next time they are used.
+CHAT_MAX_SESSIONS = int(os.environ.get("CHAT_MAX_SESSIONS", 500))
+CHAT_MAX_BYTES = int(float(os.environ.get("CHAT_MAX_MB", 64)) * 1024 * 1024)
+CHAT_SESSION_IDLE_SECONDS = float(os.environ.get("CHAT_SESSION_IDLE_SECONDS", 3600))
+
+DEFAULT_SESSION = "default"
+
+# Builds each session's memory; chatbot installs its token-budgeted memory here
+_memory_factory = ConversationBufferMemory
+
+_lock = threading.Lock()
+_sessions = OrderedDict()  # key -> ChatSession, least recently used first
+_counters = {"hits": 0, "rehydrated": 0, "created": 0, "evictions": 0}
+
+
+def set_memory_factory(factory):
+    """Use factory() for the memory of sessions created or rehydrated from now on."""
+    global _memory_factory
+    _memory_factory = factory
+
+
+def session_key(user_id=None, session_id=None):
+    """Key of a chat session; requests without ids share the legacy default session."""
+    if not user_id and not session_id:
+        return DEFAULT_SESSION
+    return f"{user_id or 'anonymous'}:{session_id or 'active'}"
+
+
+class ChatSession:
+    def __init__(self, key, context="", messages=None, summary=""):
+        self.key = key
+        self.context = context or ""
+        self.memory = _memory_factory()
+        if messages:
+            self.memory.chat_memory.messages = messages
+        if summary and hasattr(self.memory, "moving_summary_buffer"):
+            self.memory.moving_summary_buffer = summary
+        self.lock = threading.Lock()  # one turn at a time per session
+        self.last_used = time.monotonic()
+
+    def summary(self):
+        """Running summary of older turns, for memories that keep one."""
+        return getattr(self.memory, "moving_summary_buffer", "")
+
+    def size_bytes(self):
+        messages = sum(len(str(m.content)) for m in self.memory.chat_memory.messages)
+        return len(self.context) + len(self.summary()) + messages
+
+    def clear(self):
+        self.memory.clear()
+
+    def save(self):
+        """Write the session through to MongoDB so it can be rehydrated after eviction or restart."""
+        try:
+            chat_session_collection.replace_one({"_id": self.key}, {
+                "context": self.context,
+                "messages": messages_to_dict(self.memory.chat_memory.messages),
+                "summary": self.summary(),
+                "updated_at": datetime.now()
+            }, upsert=True)
+        except Exception as e:
+            print(f"Could not persist chat session {self.key}: {e}")
+
+
+def _saved_chat_messages(messages):
+    # Chats store the website's {type: user|bot, text} messages
+    converted = []
+    for message in messages:
+        if not message.get("text"):
+            continue
+        converted.append((HumanMessage if message.get("type") == "user" else AIMessage)(content=message["text"]))
+    return converted
+
+
+def _load(key):
+    try:
+        doc = chat_session_collection.find_one({"_id": key})
+        if doc:
+            return ChatSession(
+                key, doc.get("context", ""), messages_from_dict(doc.get("messages", [])), doc.get("summary", "")
+            )
+        user_id, _, chat_id = key.partition(":")
+        if ObjectId.is_valid(chat_id):
+            chat = chat_collection.find_one({"_id": ObjectId(chat_id), "user_id": user_id})
+            if chat:
+                return ChatSession(key, chat.get("context", ""), _saved_chat_messages(chat.get("messages", [])))
+    except Exception as e:
+        print(f"Could not load chat session {key}: {e}")
+    return None
+
+
+def get_session(key):
+    """The live session for key, rehydrating it from MongoDB or creating it if needed."""
+    with _lock:
+        session = _sessions.get(key)
+        if session:
+            _sessions.move_to_end(key)
+            session.last_used = time.monotonic()
+            _counters["hits"] += 1
+            return session
+    loaded = _load(key)
+    with _lock:
+        session = _sessions.get(key)  # another request may have loaded it meanwhile
+        if session is None:
+            session = loaded or ChatSession(key)
+            _sessions[key] = session
+            _counters["rehydrated" if loaded else "created"] += 1
+        session.last_used = time.monotonic()
+        _evict_locked(keep=key)
+        return session
+
+
+def _evict_locked(keep=None):
+    now = time.monotonic()
+    total = sum(session.size_bytes() for session in _sessions.values())
+    for key in list(_sessions):
+        if len(_sessions) <= CHAT_MAX_SESSIONS and total <= CHAT_MAX_BYTES:
+            idle = now - _sessions[key].last_used > CHAT_SESSION_IDLE_SECONDS
+            if not idle:
+                continue
+        session = _sessions[key]
+        if key == keep or session.lock.locked():
+            continue
+        total -= session.size_bytes()
+        del _sessions[key]
+        _counters["evictions"] += 1
+
+
+def evict_idle():
+    """Drop idle sessions from memory (they stay in MongoDB)."""
+    with _lock:
+        _evict_locked()
+
+
+def drop_session(key):
+    with _lock:
+        _sessions.pop(key, None)
+    try:
+        chat_session_collection.delete_one({"_id": key})
+    except Exception as e:
+        print(f"Could not delete chat session {key}: {e}")
+
+
+def session_stats():
+    with _lock:
+        return dict(
+            _counters,
+            sessions=len(_sessions),
+            bytes=sum(session.size_bytes() for session in _sessions.values())
+        )
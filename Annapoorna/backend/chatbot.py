@@ -1,7 +1,6 @@
 from langchain.chains import ConversationChain
-from langchain_openai.chat_models import ChatOpenAI
 from langchain.memory import ConversationBufferMemory
-from langchain.schema import SystemMessage
+from langchain_openai.chat_models import ChatOpenAI
 
 # llm = ChatOpenAI(
 #     model="unsloth-llama-3-2-3b-instruct",
@@ -17,35 +16,178 @@ from langchain.schema import SystemMessage
 #     openai_api_base="https://llama-3-2-3b-instruct-ws-7a-8000-c6d978.ml.iit-ropar.truefoundry.cloud/v1"
 # )
 
+import os
 from langchain_ollama import ChatOllama
+from langchain.prompts import PromptTemplate
+from langchain.memory import ConversationSummaryBufferMemory
+from chat_sessions import DEFAULT_SESSION, get_session, set_memory_factory
+from token_budget import approx_tokens, approx_token_ids
+import llm_gateway
 
-llm = ChatOllama(model="deepseek-r1:1.5b")
-# Initial memory
-memory = ConversationBufferMemory()
+# "summary" keeps the most recent CHAT_MEMORY_TOKENS of the conversation
+# verbatim and folds older turns into a running summary, so prompt size stays
+# roughly constant through a long chat; "buffer" keeps every turn.
+CHAT_MEMORY_MODE = os.environ.get("CHAT_MEMORY_MODE", "summary")
+CHAT_MEMORY_TOKENS = int(os.environ.get("CHAT_MEMORY_TOKENS", 1000))
 
-# Global conversation chain
-conversation = ConversationChain(
-    llm=llm,
-    memory=memory
+LLM_MODEL = "deepseek-r1:1.5b"
+llm = ChatOllama(model=LLM_MODEL, custom_get_token_ids=approx_token_ids)
+
+# Conversation memory and report context live in per-session objects
+# (chat_sessions); the chain is rebuilt per turn around the session memory.
+DEFAULT_PREAMBLE = (
+    "The following is a friendly conversation between a human and an AI. The AI is talkative and "
+    "provides lots of specific details from its context. If the AI does not know the answer to a "
+    "question, it truthfully says it does not know."
 )
 
-def returnResponse(user_input: str) -> str:
-    print(user_input)
-    response = conversation.invoke(input=user_input)
-    full_response = response.get('response', '')
 
+def systemPrompt(report: str) -> str:
+    return (
+        "You are a highly knowledgeable and helpful expert in plant pathology and crop health. "
+        "Your job is to analyze and advise farmers about their crops based on the following report. "
+        "Be clear, helpful, and specific.\n\n"
+        "It is advised to explain problem in an easy way as the farmer you are answering to might be a little uneducated. Be more solution oriented, avoid tricky terms."
+        f"Report:\n{report}"
+    )
+
+
+def _conversation(session):
+    prompt = PromptTemplate(
+        input_variables=["history", "input"],
+        template="{preamble}\n\nCurrent conversation:\n{history}\nHuman: {input}\nAI:",
+        partial_variables={"preamble": systemPrompt(session.context) if session.context else DEFAULT_PREAMBLE}
+    )
+    return ConversationChain(llm=llm, memory=session.memory, prompt=prompt)
+
+
+def stripThinking(full_response: str) -> str:
     if "</think>" in full_response:
         return full_response.split("</think>", 1)[1].strip()
     else:
-        return full_response.strip() 
+        return full_response.strip()
+
+
+class ThinklessSummaryMemory(ConversationSummaryBufferMemory):
+    """Summary buffer memory that keeps deepseek-r1's reasoning out of both the stored turns and the summary."""
+
+    def save_context(self, inputs, outputs):
+        outputs = {key: stripThinking(value) if isinstance(value, str) else value for key, value in outputs.items()}
+        super().save_context(inputs, outputs)
+
+    def predict_new_summary(self, messages, existing_summary):
+        return stripThinking(super().predict_new_summary(messages, existing_summary))
 
 
-def resetConversation():
-    conversation.memory.clear()
-    print("Conversation memory has been cleared.")
+def newMemory():
+    if CHAT_MEMORY_MODE == "buffer":
+        return ConversationBufferMemory()
+    return ThinklessSummaryMemory(llm=llm, max_token_limit=CHAT_MEMORY_TOKENS)
 
-def image_response(disease_name: str) -> str:
-    prompt = f"""
+
+set_memory_factory(newMemory)
+
+
+def _turnPrompt(session, conversation, prompt_input: str) -> str:
+    history = session.memory.load_memory_variables({})[conversation.memory.memory_key]
+    return conversation.prompt.format(history=history, input=prompt_input)
+
+
+def _logTokens(session, prompt: str, response: str):
+    print(
+        f"[chat {session.key}] prompt ~{approx_tokens(prompt)} tokens "
+        f"(context ~{approx_tokens(session.context)}, summary ~{approx_tokens(session.summary())}), "
+        f"response ~{approx_tokens(response)} tokens"
+    )
+
+
+class ThinkFilter:
+    """
+    Incremental stripThinking for streamed output: feed() returns the part of
+    each chunk that is visible to the farmer, hiding a leading <think> block
+    even when its tags are split across chunks.
+    """
+    OPEN, CLOSE = "<think>", "</think>"
+
+    def __init__(self):
+        self.state = "start"  # start -> thinking -> answer_start -> answer
+        self.buffer = ""
+
+    def feed(self, chunk: str) -> str:
+        if self.state == "answer":
+            return chunk
+        self.buffer += chunk
+        if self.state == "start":
+            head = self.buffer.lstrip()
+            if head.startswith(self.OPEN):
+                self.state = "thinking"
+            elif self.OPEN.startswith(head):
+                return ""  # could still become <think>
+            else:
+                self.state = "answer_start"
+        if self.state == "thinking":
+            if self.CLOSE not in self.buffer:
+                return ""
+            self.buffer = self.buffer.split(self.CLOSE, 1)[1]
+            self.state = "answer_start"
+        visible = self.buffer.lstrip()
+        if visible:
+            self.state = "answer"
+            self.buffer = ""
+        return visible
+
+    def finish(self) -> str:
+        """Whatever is still held back; an unterminated <think> is shown, as stripThinking does."""
+        rest = self.buffer.strip() if self.state in ("start", "thinking") else ""
+        self.buffer = ""
+        return rest
+
+
+def returnResponse(user_input: str, session_id: str = DEFAULT_SESSION) -> str:
+    print(user_input)
+    session = get_session(session_id)
+    with session.lock:
+        conversation = _conversation(session)
+        prompt = _turnPrompt(session, conversation, user_input)
+        # The slot also covers the summary call save_context may make
+        with llm_gateway.slot(llm_gateway.INTERACTIVE):
+            response = conversation.invoke(input=user_input).get('response', '')
+        _logTokens(session, prompt, response)
+        session.save()
+    return stripThinking(response)
+
+
+def _stream(session, prompt_input: str, priority: str = llm_gateway.INTERACTIVE):
+    """Yield visible answer text as the model generates it, then record the turn in the session memory."""
+    prompt = _turnPrompt(session, _conversation(session), prompt_input)
+    think = ThinkFilter()
+    parts = []
+    with llm_gateway.slot(priority):
+        for chunk in llm.stream(prompt):
+            text = chunk.content if isinstance(chunk.content, str) else ""
+            parts.append(text)
+            visible = think.feed(text)
+            if visible:
+                yield visible
+        rest = think.finish()
+        if rest:
+            yield rest
+        response = "".join(parts)
+        _logTokens(session, prompt, response)
+        session.memory.save_context({"input": prompt_input}, {"response": response})
+    session.save()
+
+
+def streamResponse(user_input: str, session_id: str = DEFAULT_SESSION):
+    """Streaming returnResponse: a generator of answer text chunks with the reasoning block removed."""
+    print(user_input)
+    session = get_session(session_id)
+    with session.lock:
+        yield from _stream(session, user_input)
+
+
+def diseasePrompt(disease_name: str, language: str = "English") -> str:
+    return f"""
 You are an expert plant pathologist. A farmer has uploaded an image of a crop leaf, and it has been identified as suffering from the following disease: **{disease_name}**.
 
 Please provide a detailed and structured report including the following:
@@ -60,32 +202,24 @@ Please provide a detailed and structured report including the following:
 8. **Environmental Conditions that Promote this Disease**
 
 Make the output concise but informative, use markdown formatting with headings or bullet points where appropriate.
-"""
+""" + (f"\nWrite the whole report in {language}.\n" if language != "English" else "")
+
 
-    response = conversation.predict(input=prompt)
-    return response
+def recordTurn(user_text: str, ai_text: str, session_id: str = DEFAULT_SESSION):
+    """Add a turn answered outside the conversation (e.g. cached advice) to the session, without an LLM call."""
+    session = get_session(session_id)
+    with session.lock:
+        session.memory.chat_memory.add_user_message(user_text)
+        session.memory.chat_memory.add_ai_message(ai_text)
+        session.save()
 
 
-def addContext(report: str):
+def addContext(report: str, session_id: str = DEFAULT_SESSION):
     """
-    Reinitializes the conversation with report as context and sets the system prompt.
+    Starts the session's conversation over with report as context for the system prompt.
     """
-    global conversation, memory
-    conversation.memory.clear()
-    
-    # System message to set behavior
-    system_prompt = (
-        "You are a highly knowledgeable and helpful expert in plant pathology and crop health. "
-        "Your job is to analyze and advise farmers about their crops based on the following report. "
-        "Be clear, helpful, and specific.\n\n"
-        "It is advised to explain problem in an easy way as the farmer you are answering to might be a little uneducated. Be more solution oriented, avoid tricky terms."
-        f"Report:\n{report}"
-    )
-    # Add system message to memory
-    memory.chat_memory.add_message(SystemMessage(content=system_prompt))
-    
-    # Reinitialize conversation with new memory and system context
-    conversation = ConversationChain(
-        llm=llm,
-        memory=memory
-    )
\ No newline at end of file
+    session = get_session(session_id)
+    with session.lock:
+        session.clear()
+        session.context = report or ""
+        session.save()
@@ -1,7 +1,6 @@
 from pydantic import BaseModel
 from pymongo import MongoClient
 from typing import List
-from chatbot import returnResponse
 from datetime import datetime
 from fastapi import HTTPException
 from bson.json_util import dumps
@@ -15,6 +14,11 @@ db = client["Annapoorna"]
 profile_collection = db["Profiles"]
 chat_collection= db["Chats"]
 report_collection=db["Reports"]
+satellite_cache_collection=db["SatelliteStatsCache"]
+scene_catalog_collection=db["SceneCatalog"]
+forecast_collection=db["WeatherForecasts"]
+chat_session_collection=db["ChatSessions"]
+disease_advice_collection=db["DiseaseAdvice"]
 class UserModel(BaseModel):
     name: str
     address: str
@@ -66,26 +70,54 @@ def login(data: dict):
         return {"error": "User not found"}
     return {"message": "Login successful", "id": str(user["_id"])}
 
+def placeholderChatName(messages: list) -> str:
+    first = next((m.get("text", "") for m in messages if m.get("type") == "user" and m.get("text")), "")
+    first = " ".join(first.split())
+    if not first:
+        return "New chat"
+    return first if len(first) <= 40 else first[:40].rstrip() + "..."
+
 def saveTheChat(chat: ChatModel):
     if len(chat.messages)==1:
         return {"message": "No chat done, not saving!"}
-    name= returnResponse("Give a one line name for this chat that we did. It must be one line only and that is really necessary!!!")
+    # Saved with a placeholder; chat_namer writes the real title later
+    name = placeholderChatName(chat.messages)
     chat_collection.insert_one({
         "user_id":chat.user_id,
         "name": name,
+        "name_pending": True,
+        "created_at": datetime.now(),
         "messages": chat.messages,
         "context": chat.context
     })
     return {"message": "Chat saved successfully", "name": name}
 
-def saveReport(user_id: str, report: str):
+def saveReport(user_id: str, report: str, fingerprint: str = None, timings: dict = None, digest: str = None):
     now=datetime.now()
     report_collection.insert_one({
         "user_id": user_id,
         "date": now,
-        "report" : report
+        "report" : report,
+        "digest": digest,
+        "fingerprint": fingerprint,
+        "timings": timings
     })
 
+def get_latest_report_fingerprint(user_id: str):
+    """_id and input fingerprint of the user's latest report, or None."""
+    return report_collection.find_one(
+        {"user_id": user_id},
+        {"_id": 1, "fingerprint": 1},
+        sort=[("date", -1)]
+    )
+
+def bump_report_date(report_id):
+    """Mark an existing report as current again instead of storing a duplicate."""
+    report_collection.update_one(
+        {"_id": report_id},
+        {"$set": {"date": datetime.now()}, "$inc": {"unchanged_runs": 1}}
+    )
+
 def get_user_id_and_bounding_box(email: str):
     user = profile_collection.find_one({"email": email}, {"_id": 1, "bounding_box": 1})
     if not user:
@@ -116,7 +148,8 @@ def get_latest_report_by_user_id(user_id: str):
         if latest_report:
             return {
                 "date": latest_report["date"],
-                "report": latest_report["report"]
+                "report": latest_report["report"],
+                "digest": latest_report.get("digest")
             }
         else:
             return None
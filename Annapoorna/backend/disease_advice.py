@@ -0,0 +1,154 @@
+"""
+Disease advice cache for /predict. The CNN can only name one of predict.class_names,
+so the explanation for each (disease, language) is generated once and kept in
+MongoDB (DiseaseAdvice) and in memory. Entries are keyed by a version hash of the
+LLM model and the prompt, so changing either invalidates them.
+
+Pre-warm every class offline with
+
+    python disease_advice.py --languages English,Hindi [--force] [--prune]
+"""
+import argparse
+import hashlib
+import os
+from datetime import datetime
+from chatbot import LLM_MODEL, llm, diseasePrompt, stripThinking, ThinkFilter, recordTurn, DEFAULT_SESSION
+from database import disease_advice_collection
+from ttl_cache import TTLCache
+import llm_gateway
+
+# Bump to invalidate stored advice without changing the model or prompt
+DISEASE_ADVICE_REVISION = os.environ.get("DISEASE_ADVICE_REVISION", "1")
+DISEASE_ADVICE_LANGUAGES = os.environ.get("DISEASE_ADVICE_LANGUAGES", "English")
+
+# Advice never changes within a version, the TTL only bounds staleness across processes
+advice_cache = TTLCache(24 * 3600, max_entries=1024, name="disease_advice")
+
+
+def advice_version(language="English"):
+    text = "\n".join([LLM_MODEL, DISEASE_ADVICE_REVISION, diseasePrompt("{disease}", language)])
+    return hashlib.sha1(text.encode()).hexdigest()[:12]
+
+
+def advice_key(disease, language="English"):
+    return f"{advice_version(language)}:{language}:{disease}"
+
+
+def _stored(key):
+    doc = disease_advice_collection.find_one({"_id": key}, {"advice": 1})
+    return doc["advice"] if doc else None
+
+
+def _store(key, disease, language, advice):
+    disease_advice_collection.replace_one({"_id": key}, {
+        "disease": disease,
+        "language": language,
+        "version": key.split(":", 1)[0],
+        "model": LLM_MODEL,
+        "advice": advice,
+        "created_at": datetime.now()
+    }, upsert=True)
+
+
+def _generate(disease, language, priority=llm_gateway.EXPLANATION):
+    started = datetime.now()
+    reply = llm_gateway.run(priority, llm.invoke, diseasePrompt(disease, language))
+    advice = stripThinking(reply.content)
+    print(f"Generated advice for {disease} ({language}) in {datetime.now() - started}")
+    return advice
+
+
+def get_advice(disease, language="English", force=False, priority=llm_gateway.EXPLANATION):
+    """Advice markdown for disease: memory, then MongoDB, then one LLM call shared by concurrent callers."""
+    key = advice_key(disease, language)
+
+    def load():
+        advice = None if force else _stored(key)
+        if advice is None:
+            advice = _generate(disease, language, priority)
+            _store(key, disease, language, advice)
+        return advice
+
+    if force:
+        advice = load()
+        advice_cache.put(key, advice)
+        return advice
+    return advice_cache.get_or_load(key, load, cache_if=bool)
+
+
+def _user_turn(disease):
+    return f"I uploaded a leaf image and it was identified as {disease}. What should I know about it?"
+
+
+def image_advice(disease, session_id=DEFAULT_SESSION, language="English"):
+    """get_advice, also recorded in the chat session so follow-up questions have it."""
+    advice = get_advice(disease, language)
+    recordTurn(_user_turn(disease), advice, session_id)
+    return advice
+
+
+def stream_image_advice(disease, session_id=DEFAULT_SESSION, language="English"):
+    """Streaming image_advice: a cached entry is sent whole, a miss is streamed while it is generated."""
+    key = advice_key(disease, language)
+    advice = advice_cache.get(key) or _stored(key)
+    if advice is None:
+        think = ThinkFilter()
+        parts = []
+        with llm_gateway.slot(llm_gateway.EXPLANATION):
+            for chunk in llm.stream(diseasePrompt(disease, language)):
+                visible = think.feed(chunk.content if isinstance(chunk.content, str) else "")
+                if visible:
+                    parts.append(visible)
+                    yield visible
+        rest = think.finish()
+        if rest:
+            parts.append(rest)
+            yield rest
+        advice = "".join(parts).strip()
+        if advice:
+            _store(key, disease, language, advice)
+    else:
+        yield advice
+    if advice:
+        advice_cache.put(key, advice)
+        recordTurn(_user_turn(disease), advice, session_id)
+
+
+def prewarm(languages, force=False):
+    """Generate and store advice for every disease class in every language. Returns (generated, failed)."""
+    from predict import class_names
+    generated = failed = 0
+    for language in languages:
+        for disease in class_names:
+            try:
+                if force or _stored(advice_key(disease, language)) is None:
+                    get_advice(disease, language, force=True, priority=llm_gateway.BACKGROUND)
+                    generated += 1
+            except Exception as e:
+                print(f"Advice for {disease} ({language}) failed: {e}")
+                failed += 1
+    return generated, failed
+
+
+def prune():
+    """Delete stored advice whose version no longer matches the current model and prompt."""
+    current = {advice_version(language) for language in disease_advice_collection.distinct("language")}
+    return disease_advice_collection.delete_many({"version": {"$nin": list(current)}}).deleted_count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--languages", default=DISEASE_ADVICE_LANGUAGES)
+    parser.add_argument("--force", action="store_true", help="regenerate entries that are already stored")
+    parser.add_argument("--prune", action="store_true", help="delete entries of older versions")
+    args = parser.parse_args()
+
+    languages = [language.strip() for language in args.languages.split(",") if language.strip()]
+    generated, failed = prewarm(languages, args.force)
+    print(f"Disease advice: {generated} generated, {failed} failed")
+    if args.prune:
+        print(f"Pruned {prune()} outdated entries")
+
+
+if __name__ == "__main__":
+    main()
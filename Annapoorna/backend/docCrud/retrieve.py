@@ -1,6 +1,6 @@
-from typing import List
+from typing import Dict, List
 import nltk
-from itertools import chain
+from collections import defaultdict
 from initializers import client, api_url
 from embed import get_embeddings
 
@@ -18,9 +18,29 @@ def chunk_text(text: str, max_tokens: int = 50, overlap: int = 10) -> List[str]:
         i += max_tokens - overlap
     return chunks
 
-def retrieve(collectionName: str, query: str, api_url: str, top_k: int = 4) -> List[str]:
+def fuse_rankings(ids: List[List[str]], distances: List[List[float]], method: str = "rrf", rrf_k: int = 60) -> Dict[str, float]:
     """
-    Retrieves relevant documents for a possibly long query by chunking and merging.
+    Combine per-chunk result lists into one score per document id.
+    "rrf": reciprocal rank fusion, sum of 1 / (rrf_k + rank) over the chunks that returned the id.
+    "distance": mean over all chunks of 1 / (1 + distance); chunks that missed the id add 0.
+    """
+    scores = defaultdict(float)
+    for chunk_ids, chunk_distances in zip(ids, distances):
+        for rank, (doc_id, distance) in enumerate(zip(chunk_ids, chunk_distances), start=1):
+            if method == "rrf":
+                scores[doc_id] += 1.0 / (rrf_k + rank)
+            elif method == "distance":
+                scores[doc_id] += 1.0 / (1.0 + distance) / len(ids)
+            else:
+                raise ValueError(f"Unknown fusion method {method}")
+    return scores
+
+def retrieve(collectionName: str, query: str, api_url: str, top_k: int = 4, fusion: str = "rrf", candidates: int = None) -> List[Dict]:
+    """
+    Retrieves relevant documents for a possibly long query by chunking it,
+    querying all chunk embeddings in one call and fusing the per-chunk rankings.
+    Returns up to top_k {'id', 'document', 'score'} dicts, best first; each
+    chunk contributes its `candidates` nearest documents (default 2 * top_k).
     """
 
     # 1. Chunk the query
@@ -35,26 +55,23 @@ def retrieve(collectionName: str, query: str, api_url: str, top_k: int = 4) -> L
     print("✅ Getting collection...")
     collection = client.get_or_create_collection(collectionName)
 
-    # 4. Query for each chunk
-    print("✅ Querying chunks...")
-    results = [
-        collection.query(query_embeddings=[emb], n_results=top_k)
-        for emb in chunk_embeddings
-    ]
-
-    # 5. Flatten and deduplicate results
-    all_docs = list(chain.from_iterable(r["documents"][0] for r in results))
-    seen = set()
-    unique_docs = []
-    for doc in all_docs:
-        if doc not in seen:
-            seen.add(doc)
-            unique_docs.append(doc)
-        if len(unique_docs) >= top_k:
-            break
-
-    return unique_docs
-
-
-docs = retrieve("all-my-documents", "Raspberries are known to grow in tropical areas. They are often red coloured and taste tangy!", api_url)
-print("\n".join(docs))
+    # 4. One query for all chunks
+    print(f"✅ Querying {len(chunk_embeddings)} chunks...")
+    results = collection.query(
+        query_embeddings=chunk_embeddings,
+        n_results=candidates or 2 * top_k,
+        include=["documents", "distances"]
+    )
+
+    # 5. Fuse the per-chunk rankings
+    documents = {}
+    for chunk_ids, chunk_docs in zip(results["ids"], results["documents"]):
+        documents.update(zip(chunk_ids, chunk_docs))
+    scores = fuse_rankings(results["ids"], results["distances"], method=fusion)
+    best = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:top_k]
+    return [{"id": doc_id, "document": documents[doc_id], "score": score} for doc_id, score in best]
+
+
+if __name__ == "__main__":
+    docs = retrieve("all-my-documents", "Raspberries are known to grow in tropical areas. They are often red coloured and taste tangy!", api_url)
+    print("\n".join(f"{doc['score']:.4f}  {doc['document']}" for doc in docs))
@@ -0,0 +1,115 @@
+import os
+from datetime import datetime, timedelta
+from pymongo import ASCENDING, DESCENDING
+from database import db
+
+# Per-field history of report statistics, one document per sensor scene, in a
+# MongoDB time-series collection bucketed by (user, sensor).
+TIMESERIES_COLLECTION = "SatelliteTimeSeries"
+# How far back trend detection looks for the previous pass
+TREND_LOOKBACK_DAYS = int(os.environ.get("TREND_LOOKBACK_DAYS", 120))
+
+_collection = None
+
+
+def _timeseries():
+    global _collection
+    if _collection is None:
+        if TIMESERIES_COLLECTION not in db.list_collection_names():
+            db.create_collection(
+                TIMESERIES_COLLECTION,
+                timeseries={"timeField": "date", "metaField": "meta", "granularity": "hours"}
+            )
+        collection = db[TIMESERIES_COLLECTION]
+        collection.create_index([("meta.user_id", ASCENDING), ("meta.sensor", ASCENDING), ("date", DESCENDING)])
+        _collection = collection
+    return _collection
+
+
+def _flatten(stats):
+    """{'NDVI': {'mean': .., 'stdDev': ..}} -> {'NDVI_mean': .., 'NDVI_stdDev': ..}, numbers only."""
+    values = {}
+    for band, band_stats in (stats or {}).items():
+        if not isinstance(band_stats, dict):
+            continue
+        for stat, value in band_stats.items():
+            if isinstance(value, (int, float)):
+                values[f"{band}_{stat}"] = value
+    return values
+
+
+def _unflatten(values):
+    stats = {}
+    for key, value in (values or {}).items():
+        band, stat = key.rsplit('_', 1)
+        stats.setdefault(band, {})[stat] = value
+    return stats
+
+
+def load_recent_stats(user_id, lookback_days=None):
+    """sensor -> [{'date', 'stats'}, ...] newest first, over the last TREND_LOOKBACK_DAYS."""
+    since = datetime.now() - timedelta(days=lookback_days or TREND_LOOKBACK_DAYS)
+    history = {}
+    try:
+        cursor = _timeseries().find(
+            {"meta.user_id": user_id, "date": {"$gte": since}},
+            {"_id": 0, "date": 1, "meta.sensor": 1, "values": 1}
+        ).sort("date", DESCENDING)
+        for doc in cursor:
+            history.setdefault(doc["meta"]["sensor"], []).append({
+                "date": doc["date"].strftime('%Y-%m-%d'),
+                "stats": _unflatten(doc.get("values"))
+            })
+    except Exception as e:
+        print(f"Could not load stats history for user {user_id}: {e}")
+    return history
+
+
+def get_series(user_id, sensor, start, end, band=None):
+    """Range read for one field and sensor: [(date, values)] oldest first, optionally a single band's mean."""
+    cursor = _timeseries().find(
+        {"meta.user_id": user_id, "meta.sensor": sensor, "date": {"$gte": start, "$lt": end}},
+        {"_id": 0, "date": 1, "values": 1}
+    ).sort("date", ASCENDING)
+    if band:
+        return [(doc["date"], doc.get("values", {}).get(f"{band}_mean")) for doc in cursor]
+    return [(doc["date"], doc.get("values", {})) for doc in cursor]
+
+
+def record_report_stats(user_id, raw_details, history=None):
+    """Append each sensor's stats from a report's raw_details unless that scene date is already stored."""
+    history = history if history is not None else load_recent_stats(user_id)
+    docs = []
+    for sensor, details in (raw_details or {}).items():
+        date = details.get("date")
+        values = _flatten(details.get("stats"))
+        if not values or not date or date == "Not available":
+            continue
+        if any(entry["date"] == date for entry in history.get(sensor, [])):
+            continue
+        docs.append({
+            "date": datetime.strptime(date, '%Y-%m-%d'),
+            "meta": {"user_id": user_id, "sensor": sensor},
+            "values": values
+        })
+    if docs:
+        try:
+            _timeseries().insert_many(docs)
+        except Exception as e:
+            print(f"Could not store stats history for user {user_id}: {e}")
+    return len(docs)
+
+
+def previous_stats(history, current_dates):
+    """
+    sensor -> {'date', 'stats'} of the newest stored pass older than the
+    current one, the prev_stats argument of generate_deep_interpretation.
+    """
+    prev = {}
+    for sensor, entries in (history or {}).items():
+        current = current_dates.get(sensor)
+        for entry in entries:
+            if current and current != "Not available" and entry["date"] < current:
+                prev[sensor] = entry
+                break
+    return prev
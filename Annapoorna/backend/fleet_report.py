@@ -0,0 +1,147 @@
+import ee
+import os
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from sattelite_report import (
+    SENSORS, SENSOR_MAX_WORKERS, analysis_window, apply_filters,
+    build_satellite_report, count_ee_calls, ee_get_info, ensure_ee, format_timestamp, merge_region_stats,
+)
+from generateReport import fieldPolygon, fieldCenter, composeReport
+from weather import get_weather_values, format_weather_report
+from report_digest import build_digest
+from database import profile_collection, saveReport
+from field_timeseries import load_recent_stats, record_report_stats
+from task_runner import run_with_deadlines
+
+# Fields per reduceRegions call (getInfo returns at most 5000 features)
+FLEET_CHUNK_SIZE = int(os.environ.get("FLEET_CHUNK_SIZE", 2000))
+# Parallel weather lookups / report saves in the per-user phase
+FLEET_USER_WORKERS = int(os.environ.get("FLEET_USER_WORKERS", 8))
+# A fleet-wide reduction takes much longer than a single field
+FLEET_SENSOR_TIMEOUT_SECONDS = float(os.environ.get("FLEET_SENSOR_TIMEOUT_SECONDS", 900))
+
+
+def load_fleet_fields():
+    """Every registered user with a usable bounding box as {user_id, email, bounding_box}."""
+    fields = []
+    for user in profile_collection.find({}, {"_id": 1, "email": 1, "bounding_box": 1}):
+        bounding_box = user.get("bounding_box")
+        if not isinstance(bounding_box, list) or len(bounding_box) != 4:
+            print(f"Skipping user {user['_id']} in fleet run: invalid bounding box {bounding_box}")
+            continue
+        fields.append({"user_id": str(user["_id"]), "email": user.get("email"), "bounding_box": bounding_box})
+    return fields
+
+
+def _latest_composite(spec, fields_fc, start_date_str, end_date_str):
+    """
+    Mosaic of the sensor's scenes over the whole fleet with the newest scene on
+    top, i.e. the latest image per tile, plus an 'acq_time' band holding each
+    pixel's acquisition time.
+    """
+    col = ee.ImageCollection(spec['collection']).filterBounds(fields_fc).filterDate(start_date_str, end_date_str)
+    col = apply_filters(col, spec['filters'])
+
+    def prepare(img):
+        processed = spec['proc_func'](img) if spec['proc_func'] else img
+        processed = ee.Image(processed).select(spec['bands'])
+        acq_time = ee.Image.constant(ee.Number(img.get('system:time_start'))).toDouble().rename('acq_time') \
+            .updateMask(processed.select(0).mask())
+        return processed.addBands(acq_time)
+
+    return col.map(prepare).sort('system:time_start').mosaic()
+
+
+def fetch_fleet_sensor(spec, fields_fc, start_date_str, end_date_str):
+    """Per-field stats for one sensor: user_id -> (None, date, stats). One getInfo per chunk."""
+    composite = _latest_composite(spec, fields_fc, start_date_str, end_date_str)
+    reducer = ee.Reducer.mean().combine(ee.Reducer.stdDev(), sharedInputs=True)
+    if len(spec['bands']) == 1:
+        # reduceRegions leaves single-band outputs unprefixed ('mean', 'stdDev')
+        band = spec['bands'][0]
+        reducer = reducer.setOutputs([f"{band}_mean", f"{band}_stdDev"])
+    stats_fc = composite.select(spec['bands']).reduceRegions(collection=fields_fc, reducer=reducer, scale=spec['scale'])
+    stats_fc = composite.select('acq_time').reduceRegions(
+        collection=stats_fc, reducer=ee.Reducer.max().setOutputs(['acq_time']), scale=spec['scale']
+    )
+    stats_fc = stats_fc.select(['.*'], None, False)  # drop geometries from the payload
+
+    results = {}
+    for feature in ee_get_info(stats_fc).get('features', []):
+        props = dict(feature['properties'])
+        user_id = props.pop('user_id')
+        acq_time = props.pop('acq_time', None)
+        if acq_time is None:
+            results[user_id] = (None, "Not available", {})
+            continue
+        results[user_id] = (None, format_timestamp(acq_time), merge_region_stats({}, props))
+    return results
+
+
+def fetch_fleet_satellite_stats(fields, utc_now):
+    """user_id -> {sensor_key: (None, date, stats)} for all fields, in a handful of EE calls per sensor."""
+    start_date_str, end_date_str = analysis_window(utc_now)
+    per_user = {field['user_id']: {} for field in fields}
+
+    for offset in range(0, len(fields), FLEET_CHUNK_SIZE):
+        chunk = fields[offset:offset + FLEET_CHUNK_SIZE]
+        fields_fc = ee.FeatureCollection([
+            ee.Feature(ee.Geometry.Polygon(fieldPolygon(field['bounding_box'])), {'user_id': field['user_id']})
+            for field in chunk
+        ])
+        tasks = {
+            spec['key']: (
+                lambda spec=spec: fetch_fleet_sensor(spec, fields_fc, start_date_str, end_date_str),
+                FLEET_SENSOR_TIMEOUT_SECONDS
+            )
+            for spec in SENSORS
+        }
+        outcomes = run_with_deadlines(tasks, max_workers=SENSOR_MAX_WORKERS, name="ee-fleet")
+        for spec in SENSORS:
+            outcome = outcomes[spec['key']]
+            if outcome['status'] != 'ok':
+                print(f"Fleet {spec['name']} not available ({outcome['status']}): {outcome['error']}")
+            sensor_results = outcome['result'] or {}
+            for field in chunk:
+                per_user[field['user_id']][spec['key']] = sensor_results.get(
+                    field['user_id'], (None, "Not available", {})
+                )
+    return per_user
+
+
+def run_fleet_reports():
+    """Generate and save the daily report for every registered field in one batch."""
+    fields = load_fleet_fields()
+    if not fields:
+        print(f"[{datetime.now()}] Fleet run: no registered fields")
+        return 0
+
+    utc_now = str(datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
+    start_date_str, end_date_str = analysis_window(utc_now)
+    print(f"[{datetime.now()}] Fleet run: computing satellite stats for {len(fields)} fields")
+    ensure_ee()
+    with count_ee_calls() as ee_calls:
+        satellite = fetch_fleet_satellite_stats(fields, utc_now)
+    print(f"Earth Engine calls for fleet run of {len(fields)} fields: {ee_calls['calls']}")
+
+    def report_for(field):
+        user_id = field['user_id']
+        try:
+            lat, lon = fieldCenter(field['bounding_box'])
+            readings = get_weather_values(lat, lon)
+            history = load_recent_stats(user_id)
+            satellite_report = build_satellite_report(
+                satellite[user_id], None, user_id, utc_now, start_date_str, end_date_str, history=history
+            )
+            record_report_stats(user_id, satellite_report[1], history)
+            digest = build_digest(readings, satellite_report[1], None, history, date=utc_now)
+            saveReport(user_id, composeReport(format_weather_report(readings), satellite_report[0]), digest=digest)
+            return True
+        except Exception as e:
+            print(f"Fleet report failed for user {user_id}: {e}")
+            return False
+
+    with ThreadPoolExecutor(max_workers=FLEET_USER_WORKERS, thread_name_prefix="fleet-report") as executor:
+        saved = sum(executor.map(report_for, fields))
+    print(f"✅ Fleet run saved {saved}/{len(fields)} reports at {datetime.now()}")
+    return saved
@@ -1,17 +1,47 @@
-from sattelite_report import generate_multisatellite_report
-from weather import get_weather_info
+from sattelite_report import (
+    analysis_window, fetch_satellite_results, flagged_pixels_for, flagged_area_section,
+    satellite_interpretation, build_satellite_report, latest_scene_ids, SENSORS
+)
+from weather import get_weather_values, format_weather_report, quantize_weather
+from field_timeseries import load_recent_stats, record_report_stats
+from database import saveReport, get_latest_report_fingerprint, bump_report_date
+from report_digest import build_digest
+from task_runner import run_with_deadlines
 from datetime import datetime
+import hashlib
+import json
+import os
+import time
 
-def generateReport(boundingBox, id):
-    print(f"Generating report for bounding box: {boundingBox} and user ID: {id}")
-    myfield=[[boundingBox[0], boundingBox[2]], [boundingBox[0], boundingBox[3]], [boundingBox[1],boundingBox[3]], [boundingBox[1],boundingBox[2]]]
+# Skip regenerating a report whose inputs (latest scenes, rounded weather) are unchanged
+REPORT_SKIP_UNCHANGED = os.environ.get("REPORT_SKIP_UNCHANGED", "1") == "1"
+# Bump when the report content changes so old fingerprints stop matching
+REPORT_FINGERPRINT_VERSION = 1
+
+# Deadline (seconds) of each report stage; a stage that misses it leaves a gap in the report
+REPORT_STAGE_TIMEOUTS = {
+    "weather": float(os.environ.get("REPORT_WEATHER_TIMEOUT_SECONDS", 20)),
+    "satellite": float(os.environ.get("REPORT_SATELLITE_TIMEOUT_SECONDS", 240)),
+    "interpretation": float(os.environ.get("REPORT_INTERPRETATION_TIMEOUT_SECONDS", 30)),
+    "flagged_areas": float(os.environ.get("REPORT_FLAGGED_TIMEOUT_SECONDS", 120)),
+    "persistence": float(os.environ.get("REPORT_PERSISTENCE_TIMEOUT_SECONDS", 30)),
+}
+STAGE_LABELS = {
+    "weather": "Weather data",
+    "satellite": "Satellite data",
+    "interpretation": "Crop health interpretation",
+    "flagged_areas": "Flagged-area analysis",
+}
+
+def fieldPolygon(boundingBox):
+    return [[boundingBox[0], boundingBox[2]], [boundingBox[0], boundingBox[3]], [boundingBox[1],boundingBox[3]], [boundingBox[1],boundingBox[2]]]
+
+def fieldCenter(boundingBox):
     lat=(boundingBox[0]+boundingBox[1])/2
     lon=(boundingBox[2]+boundingBox[3])/2
-    weatherReport=get_weather_info(lat,lon)
-    cropHealth=generate_multisatellite_report(myfield, id ,str(datetime.now().strftime('%Y-%m-%d %H:%M:%S')))[0]
-    # print("Weather Report:", weatherReport)
-    # print("Crop Health Report:", cropHealth)
-    print("report done")
+    return lat, lon
+
+def composeReport(weatherReport, cropHealth):
     return f'''
 The following is the weather report at the farmer's field
 
@@ -21,3 +51,177 @@ This is the crop health report given by the satellite
 
 {cropHealth}
 '''
+
+def reportFingerprint(sceneIds, weather):
+    payload = {
+        "version": REPORT_FINGERPRINT_VERSION,
+        "scenes": sceneIds,
+        "weather": quantize_weather(weather)
+    }
+    return hashlib.sha1(json.dumps(payload, sort_keys=True).encode()).hexdigest()
+
+def weatherComplete(weather):
+    """True when every weather provider returned readings."""
+    return bool(weather) and not any("error" in values for values in weather.values())
+
+def sensorsComplete(sceneIds, raw_details):
+    """True when every sensor with a scene in the window produced stats for the report."""
+    return all(
+        not sceneId or (raw_details.get(key) or {}).get("date") not in (None, "Not available")
+        for key, sceneId in sceneIds.items()
+    )
+
+def stageGap(stage, outcome):
+    return f"⚠️ {STAGE_LABELS[stage]} unavailable for this report ({outcome['status']}: {outcome['error']})."
+
+def stageTiming(outcome):
+    return {"status": outcome["status"], "seconds": round(outcome["seconds"], 3)}
+
+def runReportPipeline(boundingBox, id, weather=None, weatherOutcome=None):
+    """
+    Build a report in stages: weather and satellite run concurrently, then
+    interpretation and flagged areas. Each stage has a deadline from
+    REPORT_STAGE_TIMEOUTS and the report is assembled from whatever finished,
+    with gaps marked. Returns {'report', 'digest', 'raw_details', 'history',
+    'timings'}; pass already fetched weather readings as `weather`, or the
+    run_with_deadlines outcome of an earlier weather fetch (even a failed one)
+    as `weatherOutcome` so the provider is not called again.
+    """
+    print(f"Generating report for bounding box: {boundingBox} and user ID: {id}")
+    started = time.monotonic()
+    myfield=fieldPolygon(boundingBox)
+    lat, lon = fieldCenter(boundingBox)
+    utc_now = str(datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
+    start_date_str, end_date_str = analysis_window(utc_now)
+    sensorTimings = {}
+    sensorCacheKeys = {}
+
+    firstTasks = {
+        "satellite": (
+            lambda: fetch_satellite_results(myfield, utc_now, timings=sensorTimings, cache_keys=sensorCacheKeys),
+            REPORT_STAGE_TIMEOUTS["satellite"]
+        ),
+    }
+    if weatherOutcome is None:
+        firstTasks["weather"] = (
+            lambda: weather if weather is not None else get_weather_values(lat, lon),
+            REPORT_STAGE_TIMEOUTS["weather"]
+        )
+    first = run_with_deadlines(firstTasks, max_workers=2, name="report-stage")
+    if weatherOutcome is not None:
+        first["weather"] = weatherOutcome
+
+    satellite = first["satellite"]
+    if satellite["status"] == "ok":
+        results, flagged, ee_calls = satellite["result"]
+    else:
+        print(f"Satellite stage {satellite['status']} for user {id}: {satellite['error']}")
+        results = {spec['key']: (None, "Not available", {}) for spec in SENSORS}
+        flagged, ee_calls = [], None
+
+    history = {}
+    def interpretationStage():
+        history.update(load_recent_stats(id))
+        return satellite_interpretation(results, history)
+
+    def flaggedStage():
+        if flagged is not None:
+            return flagged_area_section(flagged)
+        flagged_coords_vals, _ = flagged_pixels_for(results, myfield, sensorCacheKeys)
+        return flagged_area_section(flagged_coords_vals)
+
+    second = run_with_deadlines({
+        "interpretation": (interpretationStage, REPORT_STAGE_TIMEOUTS["interpretation"]),
+        "flagged_areas": (flaggedStage, REPORT_STAGE_TIMEOUTS["flagged_areas"]),
+    }, max_workers=2, name="report-stage")
+
+    outcomes = {**first, **second}
+    readings = outcomes["weather"]["result"] if outcomes["weather"]["status"] == "ok" else None
+    weatherReport = format_weather_report(readings) if readings is not None else stageGap("weather", outcomes["weather"])
+    interpretation = outcomes["interpretation"]["result"]
+    if outcomes["interpretation"]["status"] != "ok":
+        interpretation = "\n" + stageGap("interpretation", outcomes["interpretation"]) + "\n"
+    if satellite["status"] != "ok":
+        interpretation = "\n" + stageGap("satellite", satellite) + "\n" + interpretation
+    flaggedSection = outcomes["flagged_areas"]["result"]
+    if outcomes["flagged_areas"]["status"] != "ok":
+        flaggedSection = (stageGap("flagged_areas", outcomes["flagged_areas"]), [])
+
+    satelliteReport = build_satellite_report(
+        results, None, id, utc_now, start_date_str, end_date_str, ee_calls=ee_calls,
+        interpretation=interpretation, flagged_section=flaggedSection
+    )
+    gaps = [STAGE_LABELS[stage] for stage, outcome in outcomes.items() if outcome["status"] != "ok"]
+    digest = build_digest(
+        readings, satelliteReport[1], flaggedSection[1] if outcomes["flagged_areas"]["status"] == "ok" else None,
+        history, date=utc_now, gaps=gaps
+    )
+    timings = {stage: stageTiming(outcome) for stage, outcome in outcomes.items()}
+    timings["sensors"] = sensorTimings
+    timings["total_seconds"] = round(time.monotonic() - started, 3)
+    print(f"Report stages for user {id}: {timings}")
+    return {
+        "report": composeReport(weatherReport, satelliteReport[0]),
+        "digest": digest,
+        "raw_details": satelliteReport[1],
+        "history": history if outcomes["interpretation"]["status"] == "ok" else None,
+        "timings": timings
+    }
+
+def stagesOk(timings):
+    """True when every report stage and every sensor fetch in `timings` finished ok."""
+    stages = [timing for stage, timing in timings.items() if stage not in ("sensors", "total_seconds")]
+    return all(timing["status"] == "ok" for timing in stages + list(timings.get("sensors", {}).values()))
+
+def persistReport(id, pipeline, fingerprint):
+    """
+    Persistence stage: store the field's stats history and the report with its
+    stage timings. A report with gaps is stored without its fingerprint so the
+    next run regenerates it.
+    """
+    started = time.monotonic()
+    if fingerprint and not stagesOk(pipeline["timings"]):
+        print(f"Report for user {id} has gaps, saved without a fingerprint")
+        fingerprint = None
+    record_report_stats(id, pipeline["raw_details"], pipeline["history"])
+    timings = dict(pipeline["timings"])
+    timings["persistence"] = {"status": "ok", "seconds": round(time.monotonic() - started, 3)}
+    saveReport(id, pipeline["report"], fingerprint, timings, pipeline["digest"])
+
+def refreshReport(boundingBox, id):
+    """
+    Save a new report for the field unless the latest scene per sensor and the
+    rounded weather match the last report's, in which case that report's date is
+    bumped instead. Returns True when a new report was generated.
+    """
+    lat, lon = fieldCenter(boundingBox)
+    utc_now = str(datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
+    tasks = {"weather": (lambda: get_weather_values(lat, lon), REPORT_STAGE_TIMEOUTS["weather"])}
+    if REPORT_SKIP_UNCHANGED:
+        tasks["scenes"] = (lambda: latest_scene_ids(fieldPolygon(boundingBox), utc_now), REPORT_STAGE_TIMEOUTS["satellite"])
+    inputs = run_with_deadlines(tasks, max_workers=2, name="report-inputs")
+    weather = inputs["weather"]["result"] if inputs["weather"]["status"] == "ok" else None
+
+    # Only complete inputs are fingerprinted, so a degraded report is never reused
+    fingerprint = None
+    if REPORT_SKIP_UNCHANGED:
+        if weatherComplete(weather) and inputs["scenes"]["status"] == "ok":
+            fingerprint = reportFingerprint(inputs["scenes"]["result"], weather)
+        else:
+            print(f"Could not fingerprint report inputs for user {id}: {inputs['scenes']['error'] or 'weather incomplete'}")
+        latest = get_latest_report_fingerprint(id) if fingerprint else None
+        if latest and latest.get("fingerprint") == fingerprint:
+            bump_report_date(latest["_id"])
+            print(f"Report inputs unchanged for user {id}, kept report {latest['_id']}")
+            return False
+
+    pipeline = runReportPipeline(boundingBox, id, weatherOutcome=inputs["weather"])
+    if fingerprint and not sensorsComplete(inputs["scenes"]["result"], pipeline["raw_details"]):
+        print(f"Some sensors failed for user {id}, report saved without a fingerprint")
+        fingerprint = None
+    persisted = run_with_deadlines({
+        "persistence": (lambda: persistReport(id, pipeline, fingerprint), REPORT_STAGE_TIMEOUTS["persistence"])
+    }, max_workers=1, name="report-persist")["persistence"]
+    if persisted["status"] != "ok":
+        raise RuntimeError(f"Report persistence {persisted['status']}: {persisted['error']}")
+    return True
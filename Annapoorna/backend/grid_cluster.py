@@ -0,0 +1,108 @@
+import numpy as np
+
+# Density clustering of flagged pixels on a metric grid, a linear-time stand-in
+# for DBSCAN: points are hashed into eps-sized cells, occupied cells that touch
+# (8-neighbourhood) are joined, and a group with fewer than min_samples points
+# is noise. Everything is vectorised over NumPy arrays.
+
+EARTH_RADIUS_M = 6371008.8
+
+
+def project_to_metres(lon, lat):
+    """Equirectangular projection around the points' mean latitude, in metres."""
+    lon = np.radians(np.asarray(lon, dtype=np.float64))
+    lat = np.radians(np.asarray(lat, dtype=np.float64))
+    x = EARTH_RADIUS_M * lon * np.cos(lat.mean()) if lat.size else lon
+    y = EARTH_RADIUS_M * lat
+    return x, y
+
+
+def _connected_cells(cell_x, cell_y):
+    """Component id per occupied cell, joining cells that share an edge or corner."""
+    n = cell_x.size
+    # Row-major key with a one-cell margin so neighbour offsets never wrap
+    cell_x = cell_x - cell_x.min() + 1
+    cell_y = cell_y - cell_y.min() + 1
+    width = int(cell_x.max()) + 2
+    keys = cell_y * width + cell_x  # already sorted by np.unique
+
+    src, dst = [], []
+    for dx, dy in ((1, 0), (-1, 1), (0, 1), (1, 1)):
+        target = keys + dy * width + dx
+        pos = np.searchsorted(keys, target)
+        pos[pos == n] = 0
+        hit = keys[pos] == target
+        src.append(np.nonzero(hit)[0])
+        dst.append(pos[hit])
+    src = np.concatenate(src)
+    dst = np.concatenate(dst)
+
+    # Min-label propagation with pointer jumping; converges in a few rounds
+    labels = np.arange(n)
+    while src.size:
+        low = np.minimum(labels[src], labels[dst])
+        new = labels.copy()
+        np.minimum.at(new, src, low)
+        np.minimum.at(new, dst, low)
+        new = new[new]
+        if np.array_equal(new, labels):
+            break
+        labels = new
+    return labels
+
+
+def grid_clusters(lon, lat, eps_m=50.0, min_samples=3):
+    """
+    Cluster label per point (-1 for noise), numbered 0..k-1 by first appearance.
+    Points within the same or adjacent eps_m cells belong to the same cluster.
+    """
+    lon = np.asarray(lon, dtype=np.float64)
+    if lon.size == 0:
+        return np.empty(0, dtype=np.int64)
+    x, y = project_to_metres(lon, lat)
+    cells = np.stack([np.floor(y / eps_m), np.floor(x / eps_m)], axis=1).astype(np.int64)
+    unique_cells, point_cell = np.unique(cells, axis=0, return_inverse=True)
+    point_cell = point_cell.reshape(-1)
+
+    component = _connected_cells(unique_cells[:, 1], unique_cells[:, 0])[point_cell]
+    _, component, sizes = np.unique(component, return_inverse=True, return_counts=True)
+    component = component.reshape(-1)
+    keep = sizes[component] >= min_samples
+
+    labels = np.full(lon.size, -1, dtype=np.int64)
+    if keep.any():
+        kept = component[keep]
+        _, first = np.unique(kept, return_index=True)
+        order = np.argsort(first)
+        rank = np.empty(order.size, dtype=np.int64)
+        rank[order] = np.arange(order.size)
+        _, kept_inverse = np.unique(kept, return_inverse=True)
+        labels[keep] = rank[kept_inverse.reshape(-1)]
+    return labels
+
+
+def cluster_aggregates(labels, lon, lat, param_codes, values, n_params):
+    """
+    Per-cluster point counts, centre lon/lat and per-parameter value sums and
+    counts (arrays of shape (k,) and (k, n_params)) for labels >= 0.
+    """
+    labels = np.asarray(labels)
+    clustered = labels >= 0
+    k = int(labels.max()) + 1 if clustered.any() else 0
+    lab = labels[clustered]
+    counts = np.bincount(lab, minlength=k)
+    safe = np.maximum(counts, 1)
+    center_lon = np.bincount(lab, weights=np.asarray(lon, dtype=np.float64)[clustered], minlength=k) / safe
+    center_lat = np.bincount(lab, weights=np.asarray(lat, dtype=np.float64)[clustered], minlength=k) / safe
+    flat = lab * n_params + np.asarray(param_codes)[clustered]
+    param_sums = np.bincount(
+        flat, weights=np.asarray(values, dtype=np.float64)[clustered], minlength=k * n_params
+    ).reshape(k, n_params)
+    param_counts = np.bincount(flat, minlength=k * n_params).reshape(k, n_params)
+    return {
+        'counts': counts,
+        'center_lon': center_lon,
+        'center_lat': center_lat,
+        'param_sums': param_sums,
+        'param_counts': param_counts,
+    }
@@ -0,0 +1,137 @@
+import heapq
+import itertools
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+# Every call to the local Ollama model goes through one of these priority
+# classes. At most LLM_MAX_IN_FLIGHT generations run at once; when a slot
+# frees up it goes to the oldest waiter of the most urgent class, so a burst
+# of background work (chat naming, pre-warming) cannot starve a farmer's
+# question. Each class has a bounded queue; callers beyond it, or waiting
+# longer than its timeout, get LLMBusy (HTTP 503 from the API).
+INTERACTIVE = "interactive"
+EXPLANATION = "explanation"
+BACKGROUND = "background"
+PRIORITIES = {INTERACTIVE: 0, EXPLANATION: 1, BACKGROUND: 2}
+
+LLM_MAX_IN_FLIGHT = int(os.environ.get("LLM_MAX_IN_FLIGHT", 1))
+QUEUE_LIMITS = {
+    INTERACTIVE: int(os.environ.get("LLM_QUEUE_INTERACTIVE", 32)),
+    EXPLANATION: int(os.environ.get("LLM_QUEUE_EXPLANATION", 16)),
+    BACKGROUND: int(os.environ.get("LLM_QUEUE_BACKGROUND", 64)),
+}
+# Longest a caller waits for a slot; background work waits as long as it takes
+_timeout = float(os.environ.get("LLM_QUEUE_TIMEOUT_SECONDS", 120))
+QUEUE_TIMEOUTS = {INTERACTIVE: _timeout, EXPLANATION: _timeout, BACKGROUND: None}
+
+METRIC_WINDOW = 1000  # recent requests kept per class for percentiles
+
+
+class LLMBusy(Exception):
+    """The LLM queue for a priority class is full, or the wait for a slot timed out."""
+
+
+_cond = threading.Condition()
+_waiting = []  # heap of (priority rank, ticket)
+_tickets = itertools.count()
+_in_flight = 0
+_queued = {priority: 0 for priority in PRIORITIES}
+_metrics = {
+    priority: {
+        "counters": {"admitted": 0, "rejected": 0, "timed_out": 0, "completed": 0, "failed": 0},
+        "wait": deque(maxlen=METRIC_WINDOW),
+        "generation": deque(maxlen=METRIC_WINDOW),
+    }
+    for priority in PRIORITIES
+}
+
+
+def _acquire(priority):
+    global _in_flight
+    metrics = _metrics[priority]
+    timeout = QUEUE_TIMEOUTS[priority]
+    with _cond:
+        free = _in_flight < LLM_MAX_IN_FLIGHT and not _waiting
+        if not free and _queued[priority] >= QUEUE_LIMITS[priority]:
+            metrics["counters"]["rejected"] += 1
+            raise LLMBusy(f"LLM {priority} queue is full ({QUEUE_LIMITS[priority]} waiting)")
+        entry = (PRIORITIES[priority], next(_tickets))
+        heapq.heappush(_waiting, entry)
+        _queued[priority] += 1
+        enqueued = time.monotonic()
+        try:
+            while _in_flight >= LLM_MAX_IN_FLIGHT or _waiting[0] != entry:
+                remaining = None if timeout is None else timeout - (time.monotonic() - enqueued)
+                if remaining is not None and remaining <= 0:
+                    metrics["counters"]["timed_out"] += 1
+                    raise LLMBusy(f"Timed out after {timeout:.0f}s waiting for the LLM ({priority})")
+                _cond.wait(remaining)
+            heapq.heappop(_waiting)
+        except BaseException:
+            _waiting.remove(entry)
+            heapq.heapify(_waiting)
+            _cond.notify_all()
+            raise
+        finally:
+            _queued[priority] -= 1
+        _in_flight += 1
+        metrics["counters"]["admitted"] += 1
+        metrics["wait"].append(time.monotonic() - enqueued)
+        # Another slot may still be free for the next waiter
+        _cond.notify_all()
+
+
+def _release(priority, seconds, ok):
+    global _in_flight
+    with _cond:
+        _in_flight -= 1
+        metrics = _metrics[priority]
+        metrics["counters"]["completed" if ok else "failed"] += 1
+        metrics["generation"].append(seconds)
+        _cond.notify_all()
+
+
+@contextmanager
+def slot(priority=INTERACTIVE):
+    """Hold one LLM slot for the body; raises LLMBusy if it cannot be had."""
+    _acquire(priority)
+    started = time.monotonic()
+    ok = False
+    try:
+        yield
+        ok = True
+    finally:
+        _release(priority, time.monotonic() - started, ok)
+
+
+def run(priority, fn, *args, **kwargs):
+    """fn(*args, **kwargs) inside a slot of the given class."""
+    with slot(priority):
+        return fn(*args, **kwargs)
+
+
+def _percentiles(values):
+    if not values:
+        return None
+    ordered = sorted(values)
+    pick = lambda q: ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+    return {"p50": round(pick(0.5), 3), "p95": round(pick(0.95), 3), "max": round(ordered[-1], 3)}
+
+
+def stats():
+    """Per-class counters, queue depth and recent queue-wait / generation seconds."""
+    with _cond:
+        classes = {
+            priority: dict(
+                metrics["counters"],
+                queued=_queued[priority],
+                queue_limit=QUEUE_LIMITS[priority],
+                wait_seconds=_percentiles(metrics["wait"]),
+                generation_seconds=_percentiles(metrics["generation"])
+            )
+            for priority, metrics in _metrics.items()
+        }
+        return {"max_in_flight": LLM_MAX_IN_FLIGHT, "in_flight": _in_flight, "classes": classes}
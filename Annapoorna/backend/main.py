@@ -1,26 +1,54 @@
 from fastapi import FastAPI, File, UploadFile, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel
 from apscheduler.schedulers.background import BackgroundScheduler
-from apscheduler.jobstores.base import JobLookupError
-from typing import Dict
-from uuid import uuid4
+from typing import Optional
 from datetime import datetime
-from chatbot import returnResponse, resetConversation, image_response, addContext
-from database import register, login, saveTheChat, saveReport, get_user_id_and_bounding_box, get_email_by_id, get_latest_report_by_user_id, get_all_reports, get_chats_by_user_id, profile_collection, get_chat_by_id
+from chatbot import returnResponse, addContext, streamResponse
+from disease_advice import image_advice, stream_image_advice
+from chat_sessions import session_key, session_stats, evict_idle as evict_idle_sessions
+from chat_namer import name_pending_chats, CHAT_NAMER_INTERVAL_SECONDS
+import llm_gateway
+from database import register, login, saveTheChat, get_email_by_id, get_latest_report_by_user_id, get_all_reports, get_chats_by_user_id, profile_collection, get_chat_by_id
 from predict import predict_disease
 from whisper_transcribe import router as whisper_router
-from generateReport import generateReport
+from report_scheduler import (
+    schedule_user_report, unschedule_user_report, is_user_scheduled, start_scheduler,
+    scheduler as report_scheduler
+)
+from report_queue import submit_report, get_job, get_user_job, queue_status
+from weather_forecast import prefetch_forecasts
+from fleet_report import run_fleet_reports
+import model_registry
 import threading
+import os
+import json
 from bson import ObjectId
 
 app = FastAPI()
 
-# Scheduler setup
+# When enabled, one daily fleet-wide batch replaces the per-user cron jobs
+FLEET_REPORTS = os.environ.get("FLEET_REPORTS", "0") == "1"
+FLEET_JOB_ID = "fleet-reports"
+
+# Daily report jobs live in the persistent report scheduler; this in-memory
+# scheduler only runs process-local housekeeping
 scheduler = BackgroundScheduler()
 scheduler.start()
-user_jobs: Dict[str, str] = {}  # user_id/email -> job_id
+start_scheduler()
+if FLEET_REPORTS:
+    report_scheduler.add_job(run_fleet_reports, "cron", hour=5, minute=0, id=FLEET_JOB_ID, replace_existing=True)
+# Unload models that have sat idle (see model_registry)
+scheduler.add_job(model_registry.evict_idle, "interval", minutes=1, id="model-idle-eviction", replace_existing=True)
+# Drop idle chat sessions from memory (see chat_sessions)
+scheduler.add_job(evict_idle_sessions, "interval", minutes=5, id="chat-session-eviction", replace_existing=True)
+# Title saved chats in the background (see chat_namer)
+scheduler.add_job(
+    name_pending_chats, "interval", seconds=CHAT_NAMER_INTERVAL_SECONDS, id="chat-namer",
+    replace_existing=True, max_instances=1, coalesce=True
+)
 
 # CORS
 origins = ["http://localhost:3000", "http://127.0.0.1:3000"]
@@ -32,6 +60,10 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.exception_handler(llm_gateway.LLMBusy)
+def llm_busy(request, exc):
+    return JSONResponse(status_code=503, content={"error": str(exc)}, headers={"Retry-After": "5"})
+
 # Models
 class UserModel(BaseModel):
     name: str
@@ -50,6 +82,7 @@ class ChatModel(BaseModel):
     user_id: str
     messages: list
     context: str
+    session_id: Optional[str] = None
 
 class Reports(BaseModel):
     user_id: str
@@ -57,21 +90,11 @@ class Reports(BaseModel):
 
 class ChatContext(BaseModel):
     context: str
+    user_id: Optional[str] = None
+    session_id: Optional[str] = None
 
-# Periodic task function
-def periodic_task(email: str):
-    print(f"Starting report generation for user of email ${email}")
-    user_data = get_user_id_and_bounding_box(email)
-    if not user_data:
-        print(f"[{datetime.now()}] Skipping report generation: User not found for email {email}")
-        return
-
-    bounding_box = user_data["bounding_box"]
-    user_id = user_data["id"]
-
-    report = generateReport(bounding_box, user_id)
-    saveReport(user_id, report)
-    print(f"✅ Report generated for {email} (id: {user_id}) at {datetime.now()}")
+class WarmupModel(BaseModel):
+    models: Optional[list] = None
 
 @app.post("/register")
 def register_user(user: UserModel):
@@ -81,75 +104,135 @@ def register_user(user: UserModel):
 def login_user(data: LoginModel):
     print(f"Login attempt for email: {data.email}")
     email = data.email
-    if email in user_jobs:
-        print(f"User {email} already logged in, skipping task scheduling.")
-        return {"message": "User already logged in and task is running."}
-    print(f"Scheduling periodic task for user: {email}")
-    job_id = str(uuid4())
-    scheduler.add_job(
-        periodic_task,
-        "cron",
-        hour=5,
-        minute=0,
-        args=[email],
-        id=job_id,
-        replace_existing=True
-    )
-    # periodic_task(email)  # Run immediately for the first time
-
-    print(f"Scheduled job ID {job_id} for user {email}")
-    user_jobs[email] = job_id
-    print(f"User {email} logged in successfully.")
-
-    threading.Thread(target=periodic_task, args=(email,), daemon=True).start()
-
-    return login(data.dict())
+    if FLEET_REPORTS:
+        # Daily reports come from the fleet batch job
+        print(f"Daily report for {email} comes from job {FLEET_JOB_ID}")
+    elif is_user_scheduled(email):
+        print(f"User {email} already has a scheduled report, skipping task scheduling.")
+    else:
+        schedule_user_report(email)
+    job = submit_report(email, source="login")
+    print(f"User {email} logged in successfully, report job {job['job_id']} is {job['status']}.")
+
+    response = login(data.dict())
+    if isinstance(response, dict):
+        response["report_job"] = {"job_id": job["job_id"], "status": job["status"]}
+    return response
 
 @app.post("/logout")
 def logout_user(data: LogoutModel):
     id = get_email_by_id(data.id)
-    job_id = user_jobs.get(id)
-    if not job_id:
+    if FLEET_REPORTS:
+        return {"message": f"Logged out {id}."}
+    if not unschedule_user_report(id):
         raise HTTPException(status_code=404, detail="No active task found for user.")
-    
-    try:
-        scheduler.remove_job(job_id)
-        del user_jobs[id]
-        return {"message": f"Logged out {id}, task cancelled."}
-    except JobLookupError:
-        raise HTTPException(status_code=500, detail="Failed to cancel task.")
+    return {"message": f"Logged out {id}, task cancelled."}
+
+@app.post("/fleetReports")
+def fleet_reports():
+    threading.Thread(target=run_fleet_reports, daemon=True).start()
+    return {"message": "Fleet report generation started"}
+
+@app.post("/models/warmup")
+def warmup_models(data: WarmupModel):
+    errors = model_registry.warm_up(data.models)
+    failed = {name: error for name, error in errors.items() if error}
+    if failed:
+        return JSONResponse(status_code=500, content={"errors": failed, "status": model_registry.status()})
+    return model_registry.status()
+
+@app.get("/models")
+def models_status():
+    return model_registry.status()
+
+@app.post("/weatherPrefetch")
+def weather_prefetch():
+    threading.Thread(target=prefetch_forecasts, daemon=True).start()
+    return {"message": "Weather forecast prefetch started"}
+
+@app.get("/reportJobs/{job_id}")
+def report_job_status(job_id: str):
+    job = get_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Report job not found")
+    return job
+
+@app.get("/reportJobs/user/{user_id}")
+def user_report_job_status(user_id: str):
+    job = get_user_job(get_email_by_id(user_id))
+    if not job:
+        raise HTTPException(status_code=404, detail="No report job for user")
+    return job
+
+@app.get("/reportQueue")
+def report_queue_status():
+    return queue_status()
 
 @app.post("/chat/{input}")
-def chat_with_input(input: str):
+def chat_with_input(input: str, user_id: Optional[str] = None, session_id: Optional[str] = None):
     print(f"Received input: {input}")
-    response = returnResponse(input)
+    response = returnResponse(input, session_key(user_id, session_id))
     return {"response": response}
 
+def sse(chunks, first=None):
+    """Server-sent events: an optional first payload, one {"token"} event per chunk, then a done event."""
+    def events():
+        if first is not None:
+            yield f"data: {json.dumps(first)}\n\n"
+        try:
+            for chunk in chunks:
+                yield f"data: {json.dumps({'token': chunk})}\n\n"
+        except Exception as e:
+            yield f"event: error\ndata: {json.dumps({'error': str(e)})}\n\n"
+            return
+        yield "event: done\ndata: {}\n\n"
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+@app.post("/chatStream/{input}")
+def chat_stream(input: str, user_id: Optional[str] = None, session_id: Optional[str] = None):
+    print(f"Received input: {input}")
+    return sse(streamResponse(input, session_key(user_id, session_id)))
+
 @app.post("/reset")
 def reset_chat(chat: ChatModel):
     print("Received chat:", chat)  # Debug print
+    session = session_key(chat.user_id, chat.session_id)
     saveTheChat(chat)
-    resetConversation()
+    # addContext clears the session memory as well
     report = get_latest_report_by_user_id(chat.user_id)
-    report = report["report"] if report else ""
-    addContext(report)
+    # The compact digest keeps the prompt small; older reports only have the markdown
+    report = (report.get("digest") or report["report"]) if report else ""
+    addContext(report, session)
     return {"message": "Conversation reset successfully"}
 
 @app.post("/predict")
-async def predict(file: UploadFile = File(...)):
+async def predict(file: UploadFile = File(...), user_id: Optional[str] = None, session_id: Optional[str] = None, language: str = "English"):
     if not file.content_type.startswith("image/"):
         raise HTTPException(status_code=400, detail="Uploaded file is not an image.")
     try:
         img_bytes = await file.read()
-        disease = predict_disease(img_bytes)
-        response_markdown = image_response(disease)
+        disease = await run_in_threadpool(predict_disease, img_bytes)
+        response_markdown = await run_in_threadpool(image_advice, disease, session_key(user_id, session_id), language)
         return {
             "disease": disease,
             "response": response_markdown
         }
+    except llm_gateway.LLMBusy:
+        raise
     except Exception as e:
         return JSONResponse(status_code=500, content={"error": str(e)})
     
+@app.post("/predictStream")
+async def predict_stream(file: UploadFile = File(...), user_id: Optional[str] = None, session_id: Optional[str] = None, language: str = "English"):
+    if not file.content_type.startswith("image/"):
+        raise HTTPException(status_code=400, detail="Uploaded file is not an image.")
+    try:
+        img_bytes = await file.read()
+        disease = await run_in_threadpool(predict_disease, img_bytes)
+    except Exception as e:
+        return JSONResponse(status_code=500, content={"error": str(e)})
+    return sse(stream_image_advice(disease, session_key(user_id, session_id), language), first={"disease": disease})
+
 @app.get("/allReports/{id}")
 def get_all(id: str):
     return {"reports": get_all_reports(id)}
@@ -192,5 +275,13 @@ def get_chat_by_id_route(chat_id: str):
 def setContext(data: ChatContext):
     context = data.context
     # Process the context
-    addContext(context)
+    addContext(context, session_key(data.user_id, data.session_id))
     return {"response": f"Processed context with length {len(context)}"}
+
+@app.get("/llmGateway")
+def llm_gateway_status():
+    return llm_gateway.stats()
+
+@app.get("/chatSessions")
+def chat_sessions_status():
+    return session_stats()
@@ -0,0 +1,189 @@
+import gc
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# Heavy models (Whisper, the disease CNN, Earth Engine) are registered here by
+# their modules and only loaded the first time they are used, so a worker that
+# never sees audio or images never pays for those models.
+
+# Loaded evictable models are unloaded, least recently used first, to stay under
+# this much resident memory (0 disables the budget)...
+MODEL_MEMORY_BUDGET_MB = float(os.environ.get("MODEL_MEMORY_BUDGET_MB", 0))
+# ...and any evictable model unused for this long is unloaded by evict_idle()
+MODEL_IDLE_SECONDS = float(os.environ.get("MODEL_IDLE_SECONDS", 1800))
+
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+_lock = threading.Lock()
+_load_lock = threading.Lock()  # one load at a time so memory deltas are attributable
+_models = {}
+
+
+def process_rss_bytes():
+    """Resident set size of this process from /proc/self/statm (0 where unavailable)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except (OSError, IndexError, ValueError):
+        return 0
+
+
+def register(name, loader, unloader=None, evictable=True):
+    """
+    Declare a model without loading it. loader() returns the model object;
+    unloader(model), if given, releases anything a dropped reference does not.
+    """
+    with _lock:
+        _models.setdefault(name, {
+            "loader": loader,
+            "unloader": unloader,
+            "evictable": evictable,
+            "model": None,
+            "loaded": False,
+            "rss_bytes": 0,
+            "load_seconds": None,
+            "last_used": None,
+            "in_use": 0,
+            "loads": 0,
+            "lock": threading.Lock(),
+        })
+
+
+def _load(name):
+    entry = _models[name]
+    with entry["lock"]:
+        if entry["loaded"]:
+            return
+        with _load_lock:
+            before = process_rss_bytes()
+            started = time.monotonic()
+            model = entry["loader"]()
+            entry["load_seconds"] = time.monotonic() - started
+            entry["rss_bytes"] = max(0, process_rss_bytes() - before)
+        with _lock:
+            entry["model"] = model
+            entry["loaded"] = True
+            entry["loads"] += 1
+            entry["last_used"] = time.monotonic()
+        print(f"Loaded model {name} in {entry['load_seconds']:.1f}s (+{entry['rss_bytes'] / 2**20:.0f} MB RSS)")
+    enforce_budget(keep=name)
+
+
+@contextmanager
+def use(name):
+    """Borrow a model, loading it if needed; it is never unloaded while borrowed."""
+    if name not in _models:
+        raise KeyError(f"Unknown model {name}")
+    entry = _models[name]
+    with _lock:
+        entry["in_use"] += 1
+    try:
+        if not entry["loaded"]:
+            _load(name)
+        with _lock:
+            entry["last_used"] = time.monotonic()
+        yield entry["model"]
+    finally:
+        with _lock:
+            entry["in_use"] -= 1
+            entry["last_used"] = time.monotonic()
+
+
+def get(name):
+    """Load a model if needed and return it, for models that are never evicted (e.g. Earth Engine)."""
+    with use(name) as model:
+        return model
+
+
+def unload(name):
+    """Unload a model unless it is in use. Returns True if it was unloaded."""
+    entry = _models[name]
+    with entry["lock"]:
+        with _lock:
+            if not entry["loaded"] or entry["in_use"]:
+                return False
+            model = entry["model"]
+            entry["model"] = None
+            entry["loaded"] = False
+        if entry["unloader"]:
+            try:
+                entry["unloader"](model)
+            except Exception as e:
+                print(f"Error unloading model {name}: {e}")
+        del model
+        gc.collect()
+    print(f"Unloaded model {name}")
+    return True
+
+
+def _loaded_rss():
+    return sum(entry["rss_bytes"] for entry in _models.values() if entry["loaded"])
+
+
+def enforce_budget(keep=None):
+    """Unload least recently used idle models until loaded models fit MODEL_MEMORY_BUDGET_MB."""
+    if MODEL_MEMORY_BUDGET_MB <= 0:
+        return []
+    budget = MODEL_MEMORY_BUDGET_MB * 2**20
+    with _lock:
+        candidates = sorted(
+            (entry["last_used"] or 0, name) for name, entry in _models.items()
+            if entry["loaded"] and entry["evictable"] and not entry["in_use"] and name != keep
+        )
+    unloaded = []
+    for _, name in candidates:
+        if _loaded_rss() <= budget:
+            break
+        if unload(name):
+            unloaded.append(name)
+    return unloaded
+
+
+def evict_idle(max_idle_seconds=None):
+    """Unload evictable models not used for max_idle_seconds (default MODEL_IDLE_SECONDS)."""
+    max_idle = MODEL_IDLE_SECONDS if max_idle_seconds is None else max_idle_seconds
+    now = time.monotonic()
+    with _lock:
+        idle = [
+            name for name, entry in _models.items()
+            if entry["loaded"] and entry["evictable"] and not entry["in_use"]
+            and now - (entry["last_used"] or now) > max_idle
+        ]
+    return [name for name in idle if unload(name)]
+
+
+def warm_up(names=None):
+    """Load the given models (default: all registered). Returns name -> error or None."""
+    outcome = {}
+    for name in names or list(_models):
+        try:
+            with use(name):
+                outcome[name] = None
+        except Exception as e:
+            outcome[name] = str(e)
+    return outcome
+
+
+def status():
+    now = time.monotonic()
+    with _lock:
+        models = {
+            name: {
+                "loaded": entry["loaded"],
+                "evictable": entry["evictable"],
+                "in_use": entry["in_use"],
+                "loads": entry["loads"],
+                "rss_mb": round(entry["rss_bytes"] / 2**20, 1),
+                "load_seconds": entry["load_seconds"],
+                "idle_seconds": round(now - entry["last_used"], 1) if entry["last_used"] else None,
+            }
+            for name, entry in _models.items()
+        }
+    return {
+        "process_rss_mb": round(process_rss_bytes() / 2**20, 1),
+        "budget_mb": MODEL_MEMORY_BUDGET_MB or None,
+        "idle_seconds": MODEL_IDLE_SECONDS,
+        "models": models,
+    }
@@ -1,17 +1,28 @@
 import numpy as np
-from tensorflow.keras.models import load_model
-from tensorflow.keras.preprocessing import image
 import io
 from PIL import Image
+import model_registry
+
+MODEL_NAME = "disease_cnn"
+
+def _load_disease_model():
+    from tensorflow.keras.models import load_model
+    return load_model("crop_disease_cnn_model.h5")
+
+def _unload_disease_model(model):
+    from tensorflow.keras import backend
+    backend.clear_session()
+
+model_registry.register(MODEL_NAME, _load_disease_model, _unload_disease_model)
 
-model = load_model("crop_disease_cnn_model.h5")
 class_names = ['American Bollworm on Cotton', 'Anthracnose on Cotton', 'Army worm', 'Becterial Blight in Rice', 'Brownspot', 'Common_Rust', 'Cotton Aphid', 'Flag Smut', 'Gray_Leaf_Spot', 'Healthy Maize', 'Healthy Wheat', 'Healthy cotton', 'Leaf Curl', 'Leaf smut', 'Mosaic sugarcane', 'RedRot sugarcane', 'RedRust sugarcane', 'Rice Blast', 'Sugarcane Healthy', 'Tungro', 'Wheat Brown leaf Rust', 'Wheat Stem fly', 'Wheat aphid', 'Wheat black rust', 'Wheat leaf blight', 'Wheat mite', 'Wheat powdery mildew', 'Wheat scab', 'Wheat___Yellow_Rust', 'Wilt', 'Yellow Rust Sugarcane', 'bacterial_blight in Cotton', 'bollrot on Cotton', 'bollworm on Cotton', 'cotton mealy bug', 'cotton whitefly', 'maize ear rot', 'maize fall armyworm', 'maize stem borer', 'pink bollworm in cotton', 'red cotton bug', 'thirps on  cotton'] 
 
 def predict_disease(img_bytes):
     img = Image.open(io.BytesIO(img_bytes)).convert("RGB")
     img = img.resize((224, 224))
-    img_array = image.img_to_array(img)
+    img_array = np.asarray(img, dtype=np.float32)
     img_array = np.expand_dims(img_array, axis=0) / 255.0
-    prediction = model.predict(img_array)
+    with model_registry.use(MODEL_NAME) as model:
+        prediction = model.predict(img_array)
     predicted_class = class_names[np.argmax(prediction)]
     return predicted_class
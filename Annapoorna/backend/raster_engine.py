@@ -0,0 +1,293 @@
+import hashlib
+import json
+import math
+import os
+import tempfile
+import threading
+import numpy as np
+
+# Local alternative to computing indices, stats and threshold masks inside
+# Earth Engine: each field's raw bands are downloaded once per scene into an
+# on-disk chip cache and everything else is plain NumPy on memory-mapped arrays.
+# Only download_chip talks to EE, so the math below runs on synthetic arrays.
+
+RASTER_CACHE_DIR = os.environ.get("RASTER_CACHE_DIR", "raster_cache")
+RASTER_CACHE_MAX_BYTES = int(float(os.environ.get("RASTER_CACHE_MAX_MB", 2048)) * 1024 * 1024)
+
+# Raw bands downloaded per sensor (keys match sattelite_report.SENSORS)
+CHIP_BANDS = {
+    'sentinel2': ['B2', 'B3', 'B4', 'B5', 'B8', 'B11'],
+    'landsat8': ['SR_B2', 'SR_B4', 'SR_B5', 'SR_B6', 'ST_B10'],
+    'modis_ndvi_evi': ['NDVI', 'EVI'],
+    'modis_lai': ['Lai_500m', 'Fpar_500m'],
+    'modis_lst': ['LST_Day_1km'],
+    'sentinel1': ['VV', 'VH'],
+}
+
+_cache_lock = threading.Lock()
+_counters = {"hits": 0, "misses": 0, "evictions": 0}
+
+
+# ---- Index math (same formulas as the EE expressions in sattelite_report)
+
+def _nd(a, b):
+    return (a - b) / (a + b)
+
+def sentinel2_indices(b):
+    nir, red, blue, green = b['B8'], b['B4'], b['B2'], b['B3']
+    return {
+        'NDVI': _nd(nir, red),
+        'EVI': 2.5 * ((nir - red) / (nir + 6 * red - 7.5 * blue + 1)),
+        'NDWI': _nd(nir, b['B11']),
+        'SAVI': ((nir - red) * (1 + 0.5)) / (nir + red + 0.5),
+        'MSAVI': 0.5 * (2 * nir + 1 - np.sqrt((2 * nir + 1) ** 2 - 8 * (nir - red))),
+        'NDRE': _nd(nir, b['B5']),
+        'VARI': (green - red) / (green + red - blue),
+    }
+
+def landsat8_indices(b):
+    nir, red, blue = b['SR_B5'], b['SR_B4'], b['SR_B2']
+    return {
+        'NDVI': _nd(nir, red),
+        'NDWI': _nd(nir, b['SR_B6']),
+        'EVI': 2.5 * ((nir - red) / (nir + 6 * red - 7.5 * blue + 1)),
+        'SurfaceTemp': b['ST_B10'] * 0.00341802 + 149.0,
+    }
+
+def sentinel1_indices(b):
+    return {
+        'VH_VV_RATIO': b['VH'] / b['VV'],
+        'VH_VV_DIFF': b['VH'] - b['VV'],
+    }
+
+INDEX_FUNCS = {
+    'sentinel2': sentinel2_indices,
+    'landsat8': landsat8_indices,
+    'sentinel1': sentinel1_indices,
+}
+
+
+def compute_bands(sensor_key, raw, valid):
+    """
+    Raw band arrays plus derived indices for one sensor, as float64 arrays with
+    NaN outside `valid`. `raw` maps band name -> array (a structured chip works too).
+    """
+    names = raw.dtype.names if hasattr(raw, 'dtype') and raw.dtype.names else list(raw.keys())
+    bands = {}
+    for name in names:
+        arr = np.asarray(raw[name], dtype=np.float64)
+        bands[name] = np.where(valid, arr, np.nan)
+    func = INDEX_FUNCS.get(sensor_key)
+    if func:
+        with np.errstate(divide='ignore', invalid='ignore'):
+            for name, arr in func(bands).items():
+                bands[name] = np.where(np.isfinite(arr), arr, np.nan)
+    return bands
+
+
+def band_stats(bands, center=None, center_bands=None):
+    """
+    Same shape as get_latest stats: {band: {'mean', 'stdDev'}}. Centre-pixel
+    values for `center_bands` are used only where the region mean is missing.
+    """
+    stats = {}
+    for name, arr in bands.items():
+        finite = arr[np.isfinite(arr)]
+        if finite.size:
+            stats[name] = {'mean': float(finite.mean()), 'stdDev': float(finite.std())}
+        else:
+            stats[name] = {'mean': None, 'stdDev': None}
+    if center is not None:
+        row, col = center
+        for name in center_bands or []:
+            if name in bands and stats.get(name, {}).get('mean') is None:
+                value = bands[name][row, col]
+                if np.isfinite(value):
+                    stats[name] = {'mean': float(value)}
+    return stats
+
+
+def threshold_masks(bands, params, thresholds):
+    """param -> boolean mask of pixels below the param's flag threshold."""
+    masks = {}
+    for param, th in zip(params, thresholds):
+        if param in bands:
+            with np.errstate(invalid='ignore'):
+                masks[param] = np.isfinite(bands[param]) & (bands[param] < th[1])
+    return masks
+
+
+def flagged_columns(bands, params, thresholds, grid, max_samples, seed=0):
+    """
+    Flagged pixels in the columnar form of sattelite_report.generate_flagged_areas,
+    at most max_samples // len(params) random pixels per parameter.
+    """
+    per_param = max(1, max_samples // max(1, len(params)))
+    rng = np.random.default_rng(seed)
+    lons, lats, names, values = [], [], [], []
+    for param, mask in threshold_masks(bands, params, thresholds).items():
+        rows, cols = np.nonzero(mask)
+        if rows.size > per_param:
+            pick = rng.choice(rows.size, per_param, replace=False)
+            rows, cols = rows[pick], cols[pick]
+        lon, lat = pixel_centers(grid, rows, cols)
+        lons.extend(lon.tolist())
+        lats.extend(lat.tolist())
+        names.extend([param] * rows.size)
+        values.extend(bands[param][rows, cols].tolist())
+    return {
+        'longitude': lons,
+        'latitude': lats,
+        'parameter': names,
+        'value': values,
+        'threshold_message': {param: th[2] for param, th in zip(params, thresholds)},
+    }
+
+
+# ---- Chip grid and cache
+
+def chip_grid(geometry_geojson, scale):
+    """EPSG:4326 pixel grid covering the field's bounding box at roughly `scale` metres."""
+    xs = [float(p[0]) for p in geometry_geojson]
+    ys = [float(p[1]) for p in geometry_geojson]
+    min_x, max_x, min_y, max_y = min(xs), max(xs), min(ys), max(ys)
+    mid_lat = math.radians((min_y + max_y) / 2)
+    step_x = scale / (111320.0 * max(math.cos(mid_lat), 1e-6))
+    step_y = scale / 110540.0
+    return {
+        'translateX': min_x, 'translateY': max_y,
+        'scaleX': step_x, 'scaleY': -step_y,
+        'width': max(1, math.ceil((max_x - min_x) / step_x)),
+        'height': max(1, math.ceil((max_y - min_y) / step_y)),
+    }
+
+def pixel_centers(grid, rows, cols):
+    lon = grid['translateX'] + (np.asarray(cols) + 0.5) * grid['scaleX']
+    lat = grid['translateY'] + (np.asarray(rows) + 0.5) * grid['scaleY']
+    return lon, lat
+
+def center_pixel(grid):
+    return grid['height'] // 2, grid['width'] // 2
+
+
+def _chip_paths(collection_id, scene_index, geom_hash, scale):
+    digest = hashlib.sha1(f"{collection_id}|{scene_index}|{geom_hash}|{scale}".encode()).hexdigest()
+    base = os.path.join(RASTER_CACHE_DIR, digest)
+    return base + ".npy", base + ".json"
+
+def _cache_usage():
+    entries = []
+    for name in os.listdir(RASTER_CACHE_DIR):
+        if name.endswith(".tmp"):
+            continue  # download in progress
+        path = os.path.join(RASTER_CACHE_DIR, name)
+        st = os.stat(path)
+        entries.append((st.st_mtime, st.st_size, path))
+    return entries
+
+def evict_to_budget(max_bytes=None, keep=None):
+    """Delete least recently used chips (except `keep`) until the cache fits in max_bytes."""
+    max_bytes = RASTER_CACHE_MAX_BYTES if max_bytes is None else max_bytes
+    with _cache_lock:
+        if not os.path.isdir(RASTER_CACHE_DIR):
+            return 0
+        entries = sorted(_cache_usage())
+        total = sum(size for _, size, _ in entries)
+        removed = 0
+        for _, size, path in entries:
+            if total <= max_bytes:
+                break
+            if not path.endswith(".npy") or path == keep:
+                continue
+            for victim in (path, path[:-4] + ".json"):
+                if os.path.exists(victim):
+                    total -= os.path.getsize(victim)
+                    os.remove(victim)
+            removed += 1
+        _counters["evictions"] += removed
+        return removed
+
+def cache_counters():
+    with _cache_lock:
+        return dict(_counters)
+
+
+def download_chip(scene_id, bands, geometry_geojson, grid):
+    """Raw bands plus a 'valid' band for the field, as a NumPy structured array (one EE request)."""
+    import ee
+    from sattelite_report import ee_compute_pixels  # counted like getInfo; imported late, it imports us
+    geometry = ee.Geometry.Polygon(geometry_geojson)
+    image = ee.Image(scene_id).select(bands).toFloat()
+    valid = image.mask().reduce(ee.Reducer.min()).multiply(ee.Image(1).clip(geometry).mask()).rename('valid')
+    return ee_compute_pixels({
+        'expression': image.addBands(valid.toFloat()),
+        'fileFormat': 'NUMPY_NDARRAY',
+        'grid': {
+            'dimensions': {'width': grid['width'], 'height': grid['height']},
+            'affineTransform': {
+                'scaleX': grid['scaleX'], 'shearX': 0, 'translateX': grid['translateX'],
+                'shearY': 0, 'scaleY': grid['scaleY'], 'translateY': grid['translateY'],
+            },
+            'crsCode': 'EPSG:4326',
+        },
+    })
+
+def load_chip(collection_id, scene, geom_hash, geometry_geojson, bands, scale):
+    """
+    Memory-mapped chip for (scene, field, scale) and its grid, downloading it
+    on the first request. `scene` is {'id', 'index', ...} from the scene catalog.
+    """
+    npy_path, meta_path = _chip_paths(collection_id, scene['index'], geom_hash, scale)
+    if os.path.exists(npy_path) and os.path.exists(meta_path):
+        try:
+            with open(meta_path) as f:
+                grid = json.load(f)
+            chip = np.load(npy_path, mmap_mode='r')
+            os.utime(npy_path)
+            with _cache_lock:
+                _counters["hits"] += 1
+            return chip, grid
+        except (OSError, ValueError) as e:
+            # Unreadable entry (e.g. evicted or truncated): download it again
+            print(f"Raster chip {npy_path} unreadable, downloading again: {e}")
+
+    with _cache_lock:
+        _counters["misses"] += 1
+    grid = chip_grid(geometry_geojson, scale)
+    chip = download_chip(scene['id'], bands, geometry_geojson, grid)
+    os.makedirs(RASTER_CACHE_DIR, exist_ok=True)
+    # Unique temp files so concurrent downloads of one chip never share a file;
+    # the meta is published first so a visible .npy always has its grid.
+    _write_atomic(meta_path, lambda f: f.write(json.dumps(grid).encode()))
+    _write_atomic(npy_path, lambda f: np.save(f, chip))
+    evict_to_budget(keep=npy_path)
+    return np.load(npy_path, mmap_mode='r'), grid
+
+def _write_atomic(path, write):
+    fd, tmp_path = tempfile.mkstemp(dir=RASTER_CACHE_DIR, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            write(f)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def local_sensor_result(spec, scene, geom_hash, geometry_geojson, flags=None, max_samples=10):
+    """
+    (stats, flagged columns or None) for one sensor computed from the chip cache.
+    `spec` is an entry of sattelite_report.SENSORS, `flags` its FIELD_FLAGS entry.
+    """
+    chip, grid = load_chip(
+        spec['collection'], scene, geom_hash, geometry_geojson, CHIP_BANDS[spec['key']], spec['scale']
+    )
+    valid = np.asarray(chip['valid']) > 0
+    raw = {name: chip[name] for name in chip.dtype.names if name != 'valid'}
+    bands = compute_bands(spec['key'], raw, valid)
+    stats = band_stats(bands, center_pixel(grid), spec['bands'])
+    flagged = None
+    if flags:
+        flagged = flagged_columns(bands, flags['bands'], flags['thresholds'], grid, max_samples)
+    return stats, flagged
@@ -0,0 +1,166 @@
+import os
+import numpy as np
+from sattelite_report import SENSORS, FIELD_FLAGS, THRESHOLDS, TREND_RULES, interpret, _flagged_as_columns
+from field_timeseries import previous_stats
+from grid_cluster import grid_clusters, cluster_aggregates
+from weather_client import PROVIDER_TYPES
+from token_budget import approx_tokens
+
+# Compact chat context built from the numbers behind a report (sensor means,
+# flags, trends, stress clusters, weather) instead of its markdown. Lines are
+# added most important first until REPORT_DIGEST_TOKENS is reached.
+REPORT_DIGEST_TOKENS = int(os.environ.get("REPORT_DIGEST_TOKENS", 300))
+DIGEST_MAX_CLUSTERS = 5
+
+# Line priorities: lower is kept first when the budget runs out
+ESSENTIAL, KEY, DETAIL, EXTRA = range(4)
+
+
+def _num(value, digits=2):
+    return f"{value:.{digits}f}" if isinstance(value, (int, float)) else str(value)
+
+
+def _mean(stats, band):
+    value = (stats or {}).get(band, {}).get('mean')
+    if value is None:
+        return None
+    if band in ('NDVI', 'EVI') and value > 1:
+        return value * 0.0001  # MODIS scale factor
+    if band == 'LST_Day_1km':
+        return value * 0.02 - 273.15  # MODIS LST, Kelvin * 50 -> °C
+    if band == 'SurfaceTemp':
+        return value - 273.15  # Landsat ST_B10 is scaled to Kelvin in add_indices_l8
+    return value
+
+
+def weather_lines(readings):
+    lines = []
+    for name, values in (readings or {}).items():
+        if "error" in values:
+            lines.append((DETAIL, f"Weather ({name}) unavailable."))
+            continue
+        label = PROVIDER_TYPES[name].label if name in PROVIDER_TYPES else name
+        parts = []
+        for key, template in (
+            ("temperature", "{}°C"), ("humidity", "humidity {}%"), ("rain_probability", "rain {}% now"),
+            ("rain_next_24h", "{}% next 24h"), ("rain_next_72h", "{}% next 72h"),
+            ("soil_moisture", "soil moisture {} m³/m³"), ("evapotranspiration", "ET {} mm/day"),
+        ):
+            if values.get(key, "N/A") != "N/A":
+                parts.append(template.format(values[key]))
+        if parts:
+            lines.append((ESSENTIAL, f"Weather ({label}): " + ", ".join(parts) + "."))
+    return lines
+
+
+def sensor_lines(raw_details):
+    lines = []
+    for spec in SENSORS:
+        detail = (raw_details or {}).get(spec['key']) or {}
+        stats = detail.get('stats')
+        if not stats:
+            lines.append((EXTRA, f"{spec['name']}: no recent scene."))
+            continue
+        parts = []
+        for band in spec['bands']:
+            value = _mean(stats, band)
+            if value is None:
+                continue
+            threshold_class = interpret(band if band != 'LST_Day_1km' else 'SurfaceTemp', value)
+            parts.append(f"{band} {_num(value)}" + (f" ({threshold_class.split(':')[0].split(' -')[0]})" if threshold_class else ""))
+        ndvi_std = stats.get('NDVI', {}).get('stdDev')
+        if spec['key'] == 'sentinel2' and ndvi_std and ndvi_std > 0.12:
+            parts.append(f"NDVI patchy (std {_num(ndvi_std)})")
+        if parts:
+            priority = KEY if spec['key'] in ('sentinel2', 'landsat8') else DETAIL
+            lines.append((priority, f"{spec['name']} {detail.get('date')}: " + ", ".join(parts) + "."))
+    return lines
+
+
+def flag_lines(raw_details):
+    """Field-level versions of the per-pixel flags: a sensor mean already past its flag threshold."""
+    flags = []
+    for sensor, rule in FIELD_FLAGS.items():
+        stats = ((raw_details or {}).get(sensor) or {}).get('stats')
+        for band, (lower, upper, message) in zip(rule['bands'], rule['thresholds']):
+            value = _mean(stats, band)
+            if value is None:
+                continue
+            if (lower is None or value >= lower) and (upper is None or value < upper):
+                flags.append(f"{message} ({sensor} mean {_num(value)})")
+    surface_temp = _mean(((raw_details or {}).get('landsat8') or {}).get('stats'), 'SurfaceTemp')
+    if surface_temp is not None and surface_temp >= THRESHOLDS['SurfaceTemp'][-1][0]:
+        flags.append(f"{THRESHOLDS['SurfaceTemp'][-1][2]} ({_num(surface_temp, 1)}°C)")
+    return [(ESSENTIAL, "Flags: " + "; ".join(flags) + ".")] if flags else [(KEY, "Flags: none, field means within healthy thresholds.")]
+
+
+def trend_lines(raw_details, history):
+    if not history:
+        return []
+    prev = previous_stats(history, {key: (detail or {}).get('date') for key, detail in (raw_details or {}).items()})
+    changes = []
+    for sensor, band, label, min_change in TREND_RULES:
+        now_val = _mean(((raw_details or {}).get(sensor) or {}).get('stats'), band)
+        prev_val = _mean(prev[sensor]['stats'], band) if sensor in prev else None
+        if now_val is None or prev_val is None or abs(now_val - prev_val) < min_change:
+            continue
+        direction = "down" if now_val < prev_val else "up"
+        changes.append(f"{label} {direction} {_num(prev_val)} → {_num(now_val)} since {prev[sensor]['date']}")
+    return [(ESSENTIAL, "Trends: " + "; ".join(changes) + ".")] if changes else []
+
+
+def cluster_lines(flagged, cluster_eps_m=50, min_samples=3):
+    if flagged is None:
+        return [(EXTRA, "Stress clusters: pixel flags not sampled.")]
+    columns = _flagged_as_columns(flagged or [])
+    if len(columns['longitude']) < min_samples:
+        return [(KEY, "Stress clusters: none.")]
+    lons = np.asarray(columns['longitude'], dtype=np.float64)
+    lats = np.asarray(columns['latitude'], dtype=np.float64)
+    values = np.asarray(columns['value'], dtype=np.float64)
+    param_names, param_codes = np.unique(np.asarray(columns['parameter']), return_inverse=True)
+    labels = grid_clusters(lons, lats, eps_m=cluster_eps_m, min_samples=min_samples)
+    if labels.max() < 0:
+        return [(KEY, "Stress clusters: none, only scattered flagged pixels.")]
+    agg = cluster_aggregates(labels, lons, lats, param_codes.reshape(-1), values, len(param_names))
+    order = np.argsort(-agg['counts'])
+    lines = [(ESSENTIAL, f"Stress clusters: {len(order)} (largest first, scout these).")]
+    for rank, i in enumerate(order[:DIGEST_MAX_CLUSTERS]):
+        issues = ", ".join(
+            f"{param_names[code]} {_num(agg['param_sums'][i, code] / agg['param_counts'][i, code])}"
+            for code in np.nonzero(agg['param_counts'][i])[0]
+        )
+        lines.append((
+            KEY if rank < 2 else DETAIL,
+            f"- {agg['center_lat'][i]:.5f},{agg['center_lon'][i]:.5f}: {int(agg['counts'][i])} px, {issues}"
+        ))
+    return lines
+
+
+def build_digest(readings, raw_details, flagged, history=None, date=None, token_budget=None, gaps=()):
+    """
+    Report digest text within `token_budget` (REPORT_DIGEST_TOKENS) approximate
+    tokens; lines that do not fit are dropped, least important first.
+    `readings` are weather values by provider, `flagged` the flagged_coords_vals
+    records (None when not sampled), `gaps` labels of report stages that did
+    not finish.
+    """
+    budget = REPORT_DIGEST_TOKENS if token_budget is None else token_budget
+    sections = [
+        [(ESSENTIAL, f"Field digest{f' ({date})' if date else ''}. Sensor means, flags, trends and stress clusters:")],
+        [(ESSENTIAL, f"Missing from this report: {', '.join(gaps)}.")] if gaps else [],
+        flag_lines(raw_details),
+        trend_lines(raw_details, history),
+        weather_lines(readings),
+        sensor_lines(raw_details),
+        cluster_lines(flagged),
+    ]
+    indexed = [(priority, s, n, line) for s, lines in enumerate(sections) for n, (priority, line) in enumerate(lines)]
+    kept, used = set(), 0
+    for priority, s, n, line in sorted(indexed):
+        cost = approx_tokens(line)
+        if used + cost > budget and s != 0:
+            continue
+        kept.add((s, n))
+        used += cost
+    return "\n".join(line for _, s, n, line in indexed if (s, n) in kept)
@@ -0,0 +1,125 @@
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from uuid import uuid4
+from database import get_user_id_and_bounding_box
+from generateReport import refreshReport
+
+# Every report request (login, scheduler) goes through this queue. A request
+# for a user whose report is already queued or running joins that job instead
+# of starting another one, and at most REPORT_WORKERS reports run at once.
+REPORT_WORKERS = int(os.environ.get("REPORT_WORKERS", 4))
+# Reports allowed to wait for a worker; further requests are rejected
+REPORT_MAX_QUEUE = int(os.environ.get("REPORT_MAX_QUEUE", 200))
+# Finished jobs kept for status lookups
+REPORT_JOB_HISTORY = int(os.environ.get("REPORT_JOB_HISTORY", 1000))
+
+_pool = ThreadPoolExecutor(max_workers=REPORT_WORKERS, thread_name_prefix="report")
+_lock = threading.Lock()
+_active = {}             # email -> job of its queued/running report
+_jobs = OrderedDict()    # job_id -> job, oldest first
+
+
+def periodic_task(email: str):
+    print(f"Starting report generation for user of email ${email}")
+    user_data = get_user_id_and_bounding_box(email)
+    if not user_data:
+        print(f"[{datetime.now()}] Skipping report generation: User not found for email {email}")
+        raise LookupError(f"user not found for email {email}")
+
+    bounding_box = user_data["bounding_box"]
+    user_id = user_data["id"]
+
+    generated = refreshReport(bounding_box, user_id)
+    if generated:
+        print(f"✅ Report generated for {email} (id: {user_id}) at {datetime.now()}")
+    return generated
+
+
+def _run(job):
+    with _lock:
+        job["status"] = "running"
+        job["started_at"] = datetime.now()
+    try:
+        generated = periodic_task(job["email"])
+        status, error = ("done" if generated else "unchanged"), None
+    except Exception as e:
+        print(f"Report generation failed for {job['email']}: {e}")
+        status, error = "failed", str(e)
+    with _lock:
+        job["status"] = status
+        job["error"] = error
+        job["finished_at"] = datetime.now()
+        if _active.get(job["email"]) is job:
+            del _active[job["email"]]
+
+
+def _remember(job):
+    _jobs[job["job_id"]] = job
+    while len(_jobs) > REPORT_JOB_HISTORY:
+        oldest_id, oldest = next(iter(_jobs.items()))
+        if oldest["status"] in ("queued", "running"):
+            break
+        del _jobs[oldest_id]
+
+
+def submit_report(email: str, source: str = "api"):
+    """
+    Queue a report for the user, or join the one already queued or running.
+    Returns the job status dict; its status is "rejected" when the queue is full.
+    """
+    with _lock:
+        job = _active.get(email)
+        if job:
+            job["requests"] += 1
+            return dict(job)
+        waiting = sum(1 for active in _active.values() if active["status"] == "queued")
+        job = {
+            "job_id": str(uuid4()),
+            "email": email,
+            "source": source,
+            "status": "queued",
+            "requests": 1,
+            "submitted_at": datetime.now(),
+            "started_at": None,
+            "finished_at": None,
+            "error": None,
+        }
+        if waiting >= REPORT_MAX_QUEUE:
+            job["status"] = "rejected"
+            job["error"] = "report queue is full"
+            job["finished_at"] = job["submitted_at"]
+            _remember(job)
+            return dict(job)
+        _active[email] = job
+        _remember(job)
+    _pool.submit(_run, job)
+    return dict(job)
+
+
+def get_job(job_id: str):
+    with _lock:
+        job = _jobs.get(job_id)
+        return dict(job) if job else None
+
+
+def get_user_job(email: str):
+    """The user's queued/running job, else their most recent one."""
+    with _lock:
+        job = _active.get(email)
+        if not job:
+            job = next((j for j in reversed(_jobs.values()) if j["email"] == email), None)
+        return dict(job) if job else None
+
+
+def queue_status():
+    with _lock:
+        running = sum(1 for job in _active.values() if job["status"] == "running")
+        return {
+            "workers": REPORT_WORKERS,
+            "running": running,
+            "queued": len(_active) - running,
+            "max_queue": REPORT_MAX_QUEUE,
+        }
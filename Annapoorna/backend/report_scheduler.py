@@ -0,0 +1,107 @@
+import hashlib
+import os
+from datetime import datetime, timedelta
+from apscheduler.schedulers.background import BackgroundScheduler
+from apscheduler.jobstores.mongodb import MongoDBJobStore
+from apscheduler.executors.pool import ThreadPoolExecutor as SchedulerThreadPool
+from database import client, db
+from report_queue import submit_report
+from weather_forecast import prefetch_forecasts, WEATHER_PREFETCH_LEAD_MINUTES
+
+# Daily reports are spread over a window instead of all firing at 05:00: each
+# user gets a fixed offset derived from their email, so the load is smooth and
+# the schedule survives restarts (jobs live in MongoDB).
+REPORT_WINDOW_START = os.environ.get("REPORT_WINDOW_START", "05:00")
+REPORT_WINDOW_MINUTES = int(os.environ.get("REPORT_WINDOW_MINUTES", 120))
+# A report that finds the queue full is retried this much later
+REPORT_RETRY_MINUTES = int(os.environ.get("REPORT_RETRY_MINUTES", 15))
+# Runs missed while the server was down are caught up (once) within this grace period
+REPORT_MISFIRE_GRACE_HOURS = float(os.environ.get("REPORT_MISFIRE_GRACE_HOURS", 6))
+# Only one process should run the persistent scheduler; set 0 on the other workers
+REPORT_SCHEDULER_ENABLED = os.environ.get("REPORT_SCHEDULER_ENABLED", "1") == "1"
+SCHEDULED_JOBS_COLLECTION = "ScheduledJobs"
+WEATHER_PREFETCH_JOB_ID = "weather-prefetch"
+
+scheduler = BackgroundScheduler(
+    jobstores={"default": MongoDBJobStore(database=db.name, collection=SCHEDULED_JOBS_COLLECTION, client=client)},
+    # Scheduler threads only hand reports to report_queue
+    executors={"default": SchedulerThreadPool(2)},
+    job_defaults={
+        "coalesce": True,
+        "max_instances": 1,
+        "misfire_grace_time": int(REPORT_MISFIRE_GRACE_HOURS * 3600),
+    },
+)
+
+def run_user_report(email: str):
+    """
+    Scheduled entry point: queue the user's report (see report_queue), or retry
+    it REPORT_RETRY_MINUTES later if the queue is full.
+    """
+    job = submit_report(email, source="scheduler")
+    if job["status"] == "rejected":
+        retry_at = datetime.now() + timedelta(minutes=REPORT_RETRY_MINUTES)
+        print(f"Report queue full, retrying {email} at {retry_at}")
+        scheduler.add_job(
+            run_user_report, "date", run_date=retry_at, args=[email],
+            id=f"{user_job_id(email)}:retry", replace_existing=True
+        )
+
+
+def user_job_id(email: str):
+    return f"report:{email}"
+
+
+def report_offset_seconds(email: str):
+    """Fixed offset of a user's daily report inside the window."""
+    digest = hashlib.sha1(email.encode()).hexdigest()
+    return int(digest, 16) % max(1, REPORT_WINDOW_MINUTES * 60)
+
+
+def report_time(email: str):
+    """(hour, minute, second) of the user's daily report."""
+    hour, minute = (int(part) for part in REPORT_WINDOW_START.split(":"))
+    total = (hour * 3600 + minute * 60 + report_offset_seconds(email)) % 86400
+    return total // 3600, total % 3600 // 60, total % 60
+
+
+def schedule_user_report(email: str):
+    """Add (or replace) the user's daily report job. Returns the job id."""
+    hour, minute, second = report_time(email)
+    job_id = user_job_id(email)
+    scheduler.add_job(
+        run_user_report, "cron", hour=hour, minute=minute, second=second, args=[email],
+        id=job_id, replace_existing=True
+    )
+    print(f"Scheduled daily report for {email} at {hour:02d}:{minute:02d}:{second:02d} (job {job_id})")
+    return job_id
+
+
+def is_user_scheduled(email: str):
+    return scheduler.get_job(user_job_id(email)) is not None
+
+
+def unschedule_user_report(email: str):
+    """Remove the user's daily report job. Returns False if there was none."""
+    job_id = user_job_id(email)
+    if scheduler.get_job(job_id) is None:
+        return False
+    scheduler.remove_job(job_id)
+    return True
+
+
+def schedule_weather_prefetch():
+    """Daily forecast prefetch WEATHER_PREFETCH_LEAD_MINUTES before the report window opens."""
+    hour, minute = (int(part) for part in REPORT_WINDOW_START.split(":"))
+    total = (hour * 60 + minute - WEATHER_PREFETCH_LEAD_MINUTES) % (24 * 60)
+    scheduler.add_job(
+        prefetch_forecasts, "cron", hour=total // 60, minute=total % 60,
+        id=WEATHER_PREFETCH_JOB_ID, replace_existing=True
+    )
+
+
+def start_scheduler():
+    """Start the scheduler; paused unless REPORT_SCHEDULER_ENABLED, so jobs can be edited but run elsewhere."""
+    if not scheduler.running:
+        scheduler.start(paused=not REPORT_SCHEDULER_ENABLED)
+    schedule_weather_prefetch()
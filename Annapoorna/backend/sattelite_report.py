@@ -1,6 +1,17 @@
 import ee
 from datetime import datetime, timedelta, timezone
+from contextlib import contextmanager
+from contextvars import ContextVar
+import threading
 import json
+from task_runner import run_with_deadlines
+from stats_cache import (
+    geometry_hash, cache_key, get_cached_stats, put_cached_stats, get_cached_flagged, put_cached_flagged, cache_stats
+)
+import scene_catalog
+from field_timeseries import previous_stats
+import raster_engine
+import model_registry
 
 # Initialize Earth Engine (run ee.Authenticate() interactively if needed)
 # try:
@@ -12,14 +23,77 @@ from dotenv import load_dotenv  # added to load env variables
 import os                       # added for env var support
 load_dotenv(dotenv_path=".env.local")  # load env variables
 
-PROJECT_ID = os.environ.get("PROJECT_ID") 
+PROJECT_ID = os.environ.get("PROJECT_ID")
 
+# "per_sensor" runs one get_latest per satellite, "single_call" fetches the
+# whole report as a single server-side ee.Dictionary, "local" computes it with
+# NumPy from cached raw band chips (see raster_engine)
+SATELLITE_REPORT_MODE = os.environ.get("SATELLITE_REPORT_MODE", "per_sensor")
 
+# Per-sensor fetches run concurrently; cap the parallelism and bound each sensor
+SENSOR_MAX_WORKERS = int(os.environ.get("SENSOR_MAX_WORKERS", 6))
+SENSOR_TIMEOUT_SECONDS = float(os.environ.get("SENSOR_TIMEOUT_SECONDS", 90))
 
+# Reuse stored statistics while the latest scene for a field is unchanged
+SATELLITE_CACHE = os.environ.get("SATELLITE_CACHE", "1") == "1"
+# Resolve the latest scene per field from the local scene catalog
+SCENE_CATALOG = os.environ.get("SCENE_CATALOG", "1") == "1"
 
-# Initialize GEE
+# Max flagged pixels returned per sensor, split evenly across its parameters.
+# The pixels are a random subsample spread over the whole field, so the cap
+# must leave enough density for the 50 m grid clustering (min 3 points per
+# cluster) to find stressed patches: with 200 per parameter a patch of about
+# 1/20 of the flagged area still gets ~10 points. Raising it costs payload
+# (a few tens of bytes per pixel in the getInfo) and clustering time (linear);
+# lowering it towards tens of pixels leaves only scattered points.
+FLAGGED_SAMPLE_CAP = int(os.environ.get("FLAGGED_SAMPLE_CAP", 600))
+
+
+# Initialize GEE lazily, on the first report rather than at import
 # ee.Authenticate()
-ee.Initialize(project=PROJECT_ID)
+EE_MODEL_NAME = "earth_engine"
+
+def _init_earth_engine():
+    ee.Initialize(project=PROJECT_ID)
+    return ee
+
+model_registry.register(EE_MODEL_NAME, _init_earth_engine, evictable=False)
+
+def ensure_ee():
+    """Initialize Earth Engine once per process; call before building any ee object."""
+    return model_registry.get(EE_MODEL_NAME)
+
+
+# ---- Earth Engine round-trip accounting
+# Every blocking getInfo() goes through ee_get_info (and every chip download
+# through ee_compute_pixels) so each report can log how many network
+# round-trips it cost.
+_ee_call_counter = ContextVar("ee_call_counter", default=None)
+_ee_call_lock = threading.Lock()
+
+def _count_ee_call():
+    counter = _ee_call_counter.get()
+    if counter is not None:
+        with _ee_call_lock:
+            counter["calls"] += 1
+
+def ee_get_info(obj):
+    _count_ee_call()
+    return obj.getInfo()
+
+def ee_compute_pixels(request):
+    _count_ee_call()
+    return ee.data.computePixels(request)
+
+@contextmanager
+def count_ee_calls():
+    """Count the getInfo() / computePixels round-trips made inside the block."""
+    counter = {"calls": 0}
+    token = _ee_call_counter.set(counter)
+    try:
+        yield counter
+    finally:
+        _ee_call_counter.reset(token)
 
 
 # Thresholds for parameter interpretation
@@ -225,6 +299,28 @@ def generate_deep_interpretation(
             else:
                 interpretation.append(f"MODIS LAI high ({lai:.2f}); near peak for cereals/maize.")
 
+    # --- Temporal change since the previous stored pass ---
+    if prev_stats:
+        current = {'sentinel2': s2_stats, 'landsat8': l8_stats, 'modis_lai': modis_lai_stats}
+        trend = []
+        for sensor, band, label, min_change in TREND_RULES:
+            prev = prev_stats.get(sensor)
+            now_val = (current.get(sensor) or {}).get(band, {}).get('mean')
+            prev_val = prev['stats'].get(band, {}).get('mean') if prev else None
+            if now_val is None or prev_val is None:
+                continue
+            change = now_val - prev_val
+            if change <= -min_change:
+                trend.append(
+                    f"{label} dropped from {prev_val:.2f} ({prev['date']}) to {now_val:.2f} — check for recent water stress, pests, lodging or harvest."
+                )
+            elif change >= min_change:
+                trend.append(
+                    f"{label} rose from {prev_val:.2f} ({prev['date']}) to {now_val:.2f} — crop is recovering or growing."
+                )
+        if trend:
+            interpretation.append("**Change Since Previous Pass:**\n- " + "\n- ".join(trend))
+
     return "\n\n".join(interpretation)
 
 
@@ -339,34 +435,46 @@ def generate_deep_interpretation(
 
 
 
-from sklearn.cluster import DBSCAN
+from grid_cluster import grid_clusters, cluster_aggregates
 import numpy as np
 
-def generate_flagged_area_interpretation(flagged_areas, meta=None, cluster_eps=0.0005, min_samples=3):
+def _flagged_as_columns(flagged_areas):
+    """Columnar view of flagged pixels given as flagged_coords_vals records or generate_flagged_areas columns."""
+    if isinstance(flagged_areas, dict):
+        return flagged_areas
+    return {
+        'longitude': [area['coordinates'][0] for area in flagged_areas],
+        'latitude': [area['coordinates'][1] for area in flagged_areas],
+        'parameter': [area['parameter'] for area in flagged_areas],
+        'value': [area['value'] for area in flagged_areas],
+        'threshold_message': {area['parameter']: area['threshold_message'] for area in flagged_areas},
+    }
+
+def generate_flagged_area_interpretation(flagged_areas, meta=None, cluster_eps_m=50, min_samples=3):
     """
-    - flagged_areas: list of dicts with coordinate, parameter, value, threshold_message per flagged pixel
+    - flagged_areas: list of dicts with coordinate, parameter, value, threshold_message per flagged pixel,
+      or the columnar output of generate_flagged_areas
     - meta: optional metadata for context
-    - cluster_eps: DBSCAN epsilon in degrees (approx 50m at equator if 0.0005)
+    - cluster_eps_m: grid cell size in metres; pixels in the same or adjacent cells are clustered together
     - min_samples: min points for a cluster (adjust for field size/resolution)
     Returns a detailed agronomic interpretation string for your report.
     """
-    if not flagged_areas or len(flagged_areas) == 0:
+    columns = _flagged_as_columns(flagged_areas or [])
+    n_points = len(columns['longitude'])
+    if n_points == 0:
         return "No flagged areas detected. Field is within healthy thresholds as per the latest satellite pass."
     
-    coords = [area['coordinates'] for area in flagged_areas]
-    if len(coords) < min_samples:
+    if n_points < min_samples:
         return "Only isolated flagged pixels were found; no spatial clusters detected. These may be random anomalies or noise. No urgent action needed unless similar patterns persist over time."
     
-    coords_np = np.array(coords)
-    # DBSCAN clustering (in degrees; for metric use projected coords)
-    clustering = DBSCAN(eps=cluster_eps, min_samples=min_samples).fit(coords_np)
-    labels = clustering.labels_
-    n_clusters = len(set(labels)) - (1 if -1 in labels else 0)
-    clustered_flagged = []
-    clusters = {}
-    for idx, label in enumerate(labels):
-        if label == -1: continue  # ignore "noise"
-        clusters.setdefault(label, []).append(flagged_areas[idx])
+    lons = np.asarray(columns['longitude'], dtype=np.float64)
+    lats = np.asarray(columns['latitude'], dtype=np.float64)
+    values = np.asarray(columns['value'], dtype=np.float64)
+    param_names, param_codes = np.unique(np.asarray(columns['parameter']), return_inverse=True)
+    param_codes = param_codes.reshape(-1)
+    # Grid clustering in metres (linear time, see grid_cluster)
+    labels = grid_clusters(lons, lats, eps_m=cluster_eps_m, min_samples=min_samples)
+    n_clusters = int(labels.max()) + 1
     
     # Compose results
     result = []
@@ -380,54 +488,43 @@ def generate_flagged_area_interpretation(flagged_areas, meta=None, cluster_eps=0
     # Cluster summary table with aggregated data
     cluster_table = "| Cluster # | Center Longitude | Center Latitude | Issue | Avg Value | Points Count |\n|-----------|------------------|-----------------|-------|-----------|--------------|"
     
-    for i, points in clusters.items():
-        # Calculate center coordinates
-        lons = [p['coordinates'][0] for p in points]
-        lats = [p['coordinates'][1] for p in points]
-        center_lon = sum(lons) / len(lons)
-        center_lat = sum(lats) / len(lats)
-        
-        # Group by parameter and calculate averages
-        param_groups = {}
-        for point in points:
-            param = point['parameter']
-            param_groups.setdefault(param, []).append(point)
-        
-        # Create issue summary for this cluster
+    agg = cluster_aggregates(labels, lons, lats, param_codes, values, len(param_names))
+    for i in range(n_clusters):
+        # Create issue summary for this cluster, one entry per flagged parameter
         issue_parts = []
-        for param, param_points in param_groups.items():
-            avg_val = sum(p['value'] for p in param_points) / len(param_points)
+        for code in np.nonzero(agg['param_counts'][i])[0]:
+            param = str(param_names[code])
+            avg_val = agg['param_sums'][i, code] / agg['param_counts'][i, code]
             # Use the full threshold message instead of splitting
-            threshold_msg = param_points[0]['threshold_message']
+            threshold_msg = columns['threshold_message'].get(param)
             issue_parts.append(f"{param}: {threshold_msg} (avg: {avg_val:.2f})")
         
         issue_summary = "; ".join(issue_parts)
-        total_points = len(points)
-        
-        cluster_table += f"\n| {i+1} | {center_lon:.5f} | {center_lat:.5f} | {issue_summary} | - | {total_points} |"
+        cluster_table += f"\n| {i+1} | {agg['center_lon'][i]:.5f} | {agg['center_lat'][i]:.5f} | {issue_summary} | - | {agg['counts'][i]} |"
     
     result.append(cluster_table)
     result.append("\n*Each coordinate marks the center of a detected stress cluster—scout these first.*\n")
     
     # Parameter/context diagnostics
-    all_params = [p['parameter'] for ps in clusters.values() for p in ps]
-    ndvi_vals = [p['value'] for ps in clusters.values() for p in ps if p['parameter'] == "NDVI"]
-    ndwi_vals = [p['value'] for ps in clusters.values() for p in ps if p['parameter'] == "NDWI"]
-    ndre_vals = [p['value'] for ps in clusters.values() for p in ps if p['parameter'] == "NDRE"]
+    clustered = labels >= 0
+    point_params = param_names[param_codes]
+    ndvi_vals = values[clustered & (point_params == "NDVI")]
+    ndwi_vals = values[clustered & (point_params == "NDWI")]
+    ndre_vals = values[clustered & (point_params == "NDRE")]
     result.append("### Clustered Parameter Diagnostics")
-    if ndvi_vals:
+    if ndvi_vals.size:
         mean_ndvi = np.mean(ndvi_vals)
         min_ndvi = np.min(ndvi_vals)
         if min_ndvi < 0.12:
             result.append(f"- Many flagged clusters contain NDVI < 0.18 (mean {mean_ndvi:.2f}, min {min_ndvi:.2f}): severe crop stress, stand loss, or bare soil likely.")
         else:
             result.append(f"- Cluster mean NDVI: {mean_ndvi:.2f} (some stress).")
-    if ndwi_vals:
+    if ndwi_vals.size:
         mean_ndwi = np.mean(ndwi_vals)
         min_ndwi = np.min(ndwi_vals)
         if min_ndwi < 0.08:
             result.append(f"- NDWI in clusters < 0.1 (mean {mean_ndwi:.2f}, min {min_ndwi:.2f}): active drought or deficit irrigation risk.")
-    if ndre_vals:
+    if ndre_vals.size:
         mean_ndre = np.mean(ndre_vals)
         min_ndre = np.min(ndre_vals)
         if min_ndre < 0.13:
@@ -436,9 +533,9 @@ def generate_flagged_area_interpretation(flagged_areas, meta=None, cluster_eps=0
     # Recommendations
     result.append("\n### Actionable Recommendations")
     result.append("- **Scout each cluster center coordinate first.** These are priority zones most likely to be at risk for yield loss, failed establishment, or urgent water/nutrient intervention.")
-    if ndvi_vals and min_ndvi < 0.12:
+    if ndvi_vals.size and min_ndvi < 0.12:
         result.append("- **Apply targeted soil/nutrient or irrigation rescue treatments** in clusters with very low NDVI and NDWI, based on scouting findings.")
-    if ndre_vals and min_ndre < 0.13:
+    if ndre_vals.size and min_ndre < 0.13:
         result.append("- **Nitrogen management:** Consider foliar/split N for clusters with flagged NDRE if crop stage allows.")
     result.append("- Log field observations and match with flagged clusters. Repeat mapping after management changes or next satellite pass to confirm recovery.")
     
@@ -494,40 +591,55 @@ def add_sentinel1_sar_indices(image):
 def fetch_closest_pixel(img, aoi, band, scale):
     """For MODIS/Landsat/small AOI, get pixel value of grid cell over center."""
     center = aoi.centroid()
-    vals = img.reduceRegion(ee.Reducer.first(), center, scale).getInfo()
+    vals = ee_get_info(img.reduceRegion(ee.Reducer.first(), center, scale))
     return vals.get(band, None)
 
+def format_timestamp(ts_ms):
+    """Turn an EE system:time_start (ms) into a YYYY-MM-DD string."""
+    ts = ts_ms / 1000
+    try:
+        return datetime.fromtimestamp(ts, tz=timezone.utc).strftime('%Y-%m-%d')
+    except Exception:
+        return datetime.utcfromtimestamp(ts).strftime('%Y-%m-%d')
+
 def date_of_image(img):
     """Extract date from image metadata."""
     if not img:
         return "Not available"
     try:
-        img_info = img.getInfo()
+        img_info = ee_get_info(img)
         timestamp_keys = ['system:time_start', 'system:time_end']
         for key in timestamp_keys:
             if img_info['properties'].get(key):
-                ts = img_info['properties'][key] / 1000
-                try:
-                    return datetime.fromtimestamp(ts, tz=timezone.utc).strftime('%Y-%m-%d')
-                except Exception:
-                    return datetime.utcfromtimestamp(ts).strftime('%Y-%m-%d')
+                return format_timestamp(img_info['properties'][key])
     except Exception:
         pass
     return "Not available"
 
-def get_latest(collection_id, aoi, start, end, cloud_filter=None, bands=None, proc_func=None, scale=10):
-    """Enhanced function to get latest image with flexible statistics collection."""
-    col = ee.ImageCollection(collection_id).filterBounds(aoi).filterDate(start, end)
-    if cloud_filter:
-        col = col.filter(cloud_filter)
-    img = col.sort('system:time_start', False).first()
-    if img and proc_func:
-        img = proc_func(img)
-    elif not img:
-        return None, "Not available", {}
-    
+def apply_filters(col, filter_dict):
+    """Numbers become `lt` filters, strings `eq` filters, anything else is used as an ee.Filter."""
+    for f, v in (filter_dict or {}).items():
+        if isinstance(v, (int, float)):
+            col = col.filter(ee.Filter.lt(f, v))
+        elif isinstance(v, str):
+            col = col.filter(ee.Filter.eq(f, v))
+        else:
+            col = col.filter(v)
+    return col
+
+def merge_region_stats(stats, statres):
+    """Fold reduceRegion output ('NDVI_mean', 'NDVI_stdDev', ...) into {band: {stat: value}}."""
+    for k, v in (statres or {}).items():
+        try:
+            param, stat = k.rsplit('_', 1)
+            stats.setdefault(param, {})[stat] = v
+        except Exception:
+            stats[k] = v
+    return stats
+
+def image_stats(img, aoi, bands, scale):
+    """Centre-pixel values for `bands` overlaid with region mean/stdDev of every band."""
     stats = {}
-    date = date_of_image(img)
     
     # For MODIS/Landsat on small polygons, use sample-at-center
     for band in bands or []:
@@ -541,18 +653,68 @@ def get_latest(collection_id, aoi, start, end, cloud_filter=None, bands=None, pr
     # For Sentinel-2/Sentinel-1, use region mean
     try:
         reducer = ee.Reducer.mean().combine(ee.Reducer.stdDev(), sharedInputs=True)
-        statres = img.reduceRegion(reducer, aoi, scale, maxPixels=1e9).getInfo()
-        for k, v in statres.items():
-            try:
-                param, stat = k.rsplit('_', 1)
-                stats.setdefault(param, {})[stat] = v
-            except Exception:
-                stats[k] = v
+        merge_region_stats(stats, ee_get_info(img.reduceRegion(reducer, aoi, scale, maxPixels=1e9)))
     except Exception:
         pass
+    return stats
+
+def get_latest(collection_id, aoi, start, end, cloud_filter=None, bands=None, proc_func=None, scale=10, filters=None):
+    """Enhanced function to get latest image with flexible statistics collection."""
+    col = ee.ImageCollection(collection_id).filterBounds(aoi).filterDate(start, end)
+    if cloud_filter:
+        col = col.filter(cloud_filter)
+    col = apply_filters(col, filters)
+    img = col.sort('system:time_start', False).first()
+    if img and proc_func:
+        img = proc_func(img)
+    elif not img:
+        return None, "Not available", {}
     
+    date = date_of_image(img)
+    stats = image_stats(img, aoi, bands, scale)
     return img, date, stats
 
+def _newest_scene(col):
+    """Server-side {'id', 'index', 'time_start'} of the newest image in col, or null."""
+    img = ee.Image(col.sort('system:time_start', False).first())
+    return ee.Algorithms.If(col.size().gt(0), ee.Dictionary({
+        'id': img.get('system:id'),
+        'index': img.get('system:index'),
+        'time_start': img.get('system:time_start'),
+    }), None)
+
+def latest_scene(collection_id, aoi, start, end, filters=None):
+    """Asset id, system:index and time of the newest scene in one small getInfo (None if there is none)."""
+    col = apply_filters(ee.ImageCollection(collection_id).filterBounds(aoi).filterDate(start, end), filters)
+    return ee_get_info(_newest_scene(col))
+
+def resolve_latest_scenes(geometry, geometry_key, start_date_str, end_date_str, specs=None):
+    """
+    Newest scene per sensor for a field, answered from the scene catalog.
+    Entries older than SCENE_CATALOG_REFRESH_HOURS are refreshed together in a
+    single getInfo that only scans from the newest known scene onwards.
+    """
+    specs = specs or SENSORS
+    now = datetime.now()
+    stale = [
+        spec for spec in specs
+        if scene_catalog.needs_refresh(scene_catalog.get_entry(spec['collection'], geometry_key), now)
+    ]
+    if stale:
+        query = {}
+        for spec in stale:
+            entry = scene_catalog.get_entry(spec['collection'], geometry_key)
+            since = scene_catalog.refresh_since(entry, start_date_str)
+            col = ee.ImageCollection(spec['collection']).filterBounds(geometry).filterDate(since, end_date_str)
+            query[spec['key']] = _newest_scene(apply_filters(col, spec['filters']))
+        found = ee_get_info(ee.Dictionary(query))
+        for spec in stale:
+            scene_catalog.record_refresh(spec['collection'], geometry_key, found.get(spec['key']), now)
+    return {
+        spec['key']: scene_catalog.latest_scene(spec['collection'], geometry_key, start_date_str)
+        for spec in specs
+    }
+
 def add_indices_s2(image):
     """Add Sentinel-2 specific indices (alias for existing function)."""
     return add_all_indices(image)
@@ -579,28 +741,66 @@ INDEX_BANDS = {
     'Sentinel-1': ['VV', 'VH', 'VH_VV_RATIO', 'VH_VV_DIFF']
 }
 
+# Sensors that make up one multi-satellite report, in report order.
+# 'key' is the raw_details key, 'name' the label used in the report metadata.
+SENSORS = [
+    {'key': 'sentinel2', 'name': 'Sentinel-2', 'collection': 'COPERNICUS/S2_SR_HARMONIZED',
+     'filters': {'CLOUDY_PIXEL_PERCENTAGE': 15}, 'bands': INDEX_BANDS['Sentinel-2'], 'proc_func': add_indices_s2, 'scale': 10},
+    {'key': 'landsat8', 'name': 'Landsat 8', 'collection': 'LANDSAT/LC08/C02/T1_L2',
+     'filters': {'CLOUD_COVER': 15}, 'bands': INDEX_BANDS['Landsat-8'], 'proc_func': add_indices_l8, 'scale': 30},
+    {'key': 'modis_ndvi_evi', 'name': 'MODIS NDVI/EVI', 'collection': 'MODIS/061/MOD13Q1',
+     'filters': {}, 'bands': ['NDVI', 'EVI'], 'proc_func': None, 'scale': 500},
+    {'key': 'modis_lai', 'name': 'MODIS LAI', 'collection': 'MODIS/061/MOD15A2H',
+     'filters': {}, 'bands': ['Lai_500m', 'Fpar_500m'], 'proc_func': None, 'scale': 500},
+    {'key': 'modis_lst', 'name': 'MODIS LST', 'collection': 'MODIS/061/MOD11A1',
+     'filters': {}, 'bands': ['LST_Day_1km'], 'proc_func': None, 'scale': 1000},
+    {'key': 'sentinel1', 'name': 'Sentinel-1', 'collection': 'COPERNICUS/S1_GRD',
+     'filters': {'instrumentMode': 'IW'}, 'bands': INDEX_BANDS['Sentinel-1'], 'proc_func': add_sar_indices, 'scale': 10},
+]
+
+# Per-pixel flag thresholds for the sensors we sample flagged areas from
+FIELD_FLAGS = {
+    'sentinel2': {
+        'bands': ['NDVI', 'NDWI', 'NDRE'],
+        'thresholds': [
+            (None, 0.2, "NDVI low: possible sparse or stressed vegetation"),
+            (None, 0.1, "NDWI low: likely dry/drought stress"),
+            (None, 0.1, "NDRE low: potential N deficiency"),
+        ],
+        'scale': 10,
+    },
+    'landsat8': {
+        'bands': ['NDVI', 'NDWI'],
+        'thresholds': [
+            (None, 0.2, "NDVI low: sparse or failed zones"),
+            (None, 0.1, "NDWI low: water deficit"),
+        ],
+        'scale': 30,
+    },
+}
+
+NO_FLAGGED_PIXELS_MESSAGE = "No flagged pixels found. Everything is within healthy thresholds."
+
+# (sensor, band, label, minimum change between passes worth reporting)
+TREND_RULES = [
+    ('sentinel2', 'NDVI', "Sentinel-2 NDVI", 0.1),
+    ('sentinel2', 'NDWI', "Sentinel-2 NDWI", 0.1),
+    ('landsat8', 'NDVI', "Landsat 8 NDVI", 0.1),
+    ('modis_lai', 'Lai_500m', "MODIS LAI", 0.5),
+]
+
 def get_latest_image_and_date(collection_id, geometry, start_date, end_date, filter_dict, sort_field='system:time_start'):
     col = ee.ImageCollection(collection_id).filterBounds(geometry).filterDate(start_date, end_date)
-    for f, v in filter_dict.items():
-        if isinstance(v, (int, float)):
-            col = col.filter(ee.Filter.lt(f, v))
-        elif isinstance(v, str):
-            col = col.filter(ee.Filter.eq(f, v))
-        else:
-            col = col.filter(v)
+    col = apply_filters(col, filter_dict)
     col = col.sort(sort_field, False)
     img = col.first()
     dt = "Not available"
     if img:
-        img_info = img.getInfo()
+        img_info = ee_get_info(img)
         timestamp_keys = ['system:time_start', 'system:time_end']
         for key in timestamp_keys:
             if img_info['properties'].get(key):
-                ts = img_info['properties'][key] / 1000
-                try:
-                    dt = datetime.fromtimestamp(ts, tz=timezone.utc).strftime('%Y-%m-%d')
-                except Exception:
-                    dt = datetime.utcfromtimestamp(ts).strftime('%Y-%m-%d')
+                dt = format_timestamp(img_info['properties'][key])
                 break
     return img, dt
 
@@ -650,7 +850,7 @@ def get_image_statistics(image, geometry, scale=10):
         .combine(ee.Reducer.stdDev(), sharedInputs=True) \
         .combine(ee.Reducer.min(), sharedInputs=True) \
         .combine(ee.Reducer.max(), sharedInputs=True)
-    stats = image.reduceRegion(reducer=reducers, geometry=geometry, scale=scale, maxPixels=1e9).getInfo()
+    stats = ee_get_info(image.reduceRegion(reducer=reducers, geometry=geometry, scale=scale, maxPixels=1e9))
     results = {}
     for key, value in stats.items():
         band, stat = key.rsplit('_', 1)
@@ -723,90 +923,395 @@ def get_field_issue_flags(stats, bands, thresholds):
                 })
     return flags
 
-def generate_flagged_areas(image, geometry, bands, thresholds, scale=10):
+def flagged_sample_columns(image, bands, thresholds, geometry, scale, max_samples):
+    """
+    Server-side list [longitudes, latitudes, parameters, values] of flagged
+    pixels. All thresholds are applied to one stacked image that is sampled in
+    a single pass, then at most max_samples // len(bands) random pixels are
+    kept per parameter, so the payload does not grow with the field size.
+    """
+    per_param = max(1, max_samples // len(bands))
+    flagged_bands = []
+    for param, th in zip(bands, thresholds):
+        band_img = image.select(param)
+        flagged_bands.append(band_img.updateMask(band_img.lt(th[1])))
+    flagged = ee.Image.cat(flagged_bands)
+    # keep only pixels flagged for at least one parameter
+    any_flag = flagged.mask().reduce(ee.Reducer.max())
+    flagged = flagged.addBands(ee.Image.pixelLonLat()).updateMask(any_flag)
+    pixels = flagged.sample(region=geometry, scale=scale, geometries=False, dropNulls=False)
+
+    samples = ee.FeatureCollection([])
+    for param in bands:
+        samples = samples.merge(
+            pixels.filter(ee.Filter.notNull([param]))
+            .randomColumn('rand', 0).sort('rand').limit(per_param)
+            .map(lambda f, param=param: f.set({'parameter': param, 'value': f.get(param)}))
+        )
+    return samples.reduceColumns(
+        ee.Reducer.toList().repeat(4), ['longitude', 'latitude', 'parameter', 'value']
+    ).get('list')
+
+def _flagged_columns(column_lists, bands, thresholds):
+    lons, lats, params, values = column_lists or ([], [], [], [])
+    return {
+        'longitude': lons,
+        'latitude': lats,
+        'parameter': params,
+        'value': values,
+        'threshold_message': {param: th[2] for param, th in zip(bands, thresholds)},
+    }
+
+def generate_flagged_areas(image, geometry, bands, thresholds, scale=10, max_samples=None, stats_key=None):
+    """
+    Flagged pixels of `image` as columns {'longitude', 'latitude', 'parameter',
+    'value', 'threshold_message'}, fetched with one getInfo and capped at
+    max_samples (FLAGGED_SAMPLE_CAP) pixels stratified per parameter. With the
+    satellite cache key of the image's stats (`stats_key`) the sample is kept
+    next to them, so an unchanged scene is not sampled again.
+    """
+    if not image:
+        return _flagged_columns(None, bands, thresholds)
+    max_samples = max_samples or FLAGGED_SAMPLE_CAP
     try:
-        flagged_pixels = []
-        message = "No flagged pixels found. Everything is within healthy thresholds."
-        if not image:
-            return flagged_pixels
-
-        for param, th in zip(bands, thresholds):
-            band_names = image.bandNames().getInfo()
-            if param not in band_names:
-                continue
-            threshold_val = th[1]
-            band_img = image.select(param)
-            mask = band_img.lt(threshold_val)
-            masked_img = band_img.updateMask(mask)
-            if not masked_img:
-                return flagged_pixels.append({"message": message})
-            samples = masked_img.sample(region=geometry, scale=scale, geometries=True).getInfo()
-            for feature in samples.get('features', []):
-                coords = feature['geometry']['coordinates']
-                props = feature['properties']
-                flagged_pixels.append({
-                    'message': "flagged aread detected",
-                    'parameter': param,
-                    'threshold_message': th[2],
-                    'value': props.get(param),
-                    'coordinates': coords
-                })
-        return flagged_pixels
+        columns = get_cached_flagged(stats_key, max_samples) if stats_key else None
+        if columns is None:
+            columns = ee_get_info(flagged_sample_columns(image, bands, thresholds, geometry, scale, max_samples))
+            if stats_key:
+                put_cached_flagged(stats_key, max_samples, columns)
+        return _flagged_columns(columns, bands, thresholds)
     except Exception as e:
         print(f"Error generating flagged areas: {e}")
-        flagged_pixels = []
-        message = "No flagged pixels found. Everything is within healthy thresholds."
-        return flagged_pixels.append({"message": message})
-        
+        return _flagged_columns(None, bands, thresholds)
+
+def flagged_columns_to_records(columns):
+    """Row form of generate_flagged_areas output, as returned in flagged_coords_vals."""
+    return [
+        {
+            'message': "flagged aread detected",
+            'parameter': param,
+            'threshold_message': columns['threshold_message'].get(param),
+            'value': value,
+            'coordinates': [lon, lat]
+        }
+        for lon, lat, param, value in zip(
+            columns['longitude'], columns['latitude'], columns['parameter'], columns['value']
+        )
+    ]
 
-def generate_multisatellite_report(geometry_geojson, user_login, utc_now):
-    geometry = ee.Geometry.Polygon(geometry_geojson)
+def fetch_sensor(spec, geometry, start_date_str, end_date_str, geometry_key=None, scenes=None, cache_keys=None):
+    """
+    Run get_latest for one entry of SENSORS. With a geometry_key (see
+    stats_cache.geometry_hash) only the newest scene id is looked up and the
+    statistics come from the cache unless that scene is new. `scenes` is the
+    output of resolve_latest_scenes; without it the scene id is asked from EE.
+    The cache key of the statistics is added to `cache_keys` if given.
+    """
+    if not (SATELLITE_CACHE and geometry_key):
+        return get_latest(
+            spec['collection'], geometry, start_date_str, end_date_str,
+            bands=spec['bands'], proc_func=spec['proc_func'], scale=spec['scale'],
+            filters=spec['filters']
+        )
+
+    if scenes is not None:
+        scene = scenes.get(spec['key'])
+    else:
+        scene = latest_scene(spec['collection'], geometry, start_date_str, end_date_str, spec['filters'])
+    if not scene:
+        return None, "Not available", {}
+    img = ee.Image(scene['id'])
+    if spec['proc_func']:
+        img = spec['proc_func'](img)
+    date = format_timestamp(scene['time_start']) if scene.get('time_start') else "Not available"
+
+    key = cache_key(spec['collection'], scene['index'], geometry_key, spec['scale'])
+    if cache_keys is not None:
+        cache_keys[spec['key']] = key
+    cached = get_cached_stats(key)
+    if cached:
+        return img, cached['date'], cached['stats']
+    stats = image_stats(img, geometry, spec['bands'], spec['scale'])
+    if stats:
+        put_cached_stats(key, spec['collection'], scene['index'], geometry_key, spec['scale'], date, stats)
+    return img, date, stats
+
+def fetch_sensors(geometry, start_date_str, end_date_str, specs=None, max_workers=None, timeout=None, geometry_key=None, scenes=None, timings=None, cache_keys=None):
+    """
+    Fetch all sensors concurrently. A sensor that fails or misses its deadline
+    comes back as (None, "Not available", {}) without holding up the others.
+    A spec may set its own 'timeout' (seconds). Each sensor's status and
+    seconds are added to `timings`, its stats cache key to `cache_keys`, if given.
+    """
+    specs = specs or SENSORS
+    tasks = {
+        spec['key']: (
+            lambda spec=spec: fetch_sensor(spec, geometry, start_date_str, end_date_str, geometry_key, scenes, cache_keys),
+            spec.get('timeout', timeout or SENSOR_TIMEOUT_SECONDS)
+        )
+        for spec in specs
+    }
+    outcomes = run_with_deadlines(tasks, max_workers=max_workers or SENSOR_MAX_WORKERS, name="ee-sensor")
+
+    results = {}
+    for spec in specs:
+        outcome = outcomes[spec['key']]
+        if timings is not None:
+            timings[spec['key']] = {'status': outcome['status'], 'seconds': round(outcome['seconds'], 3)}
+        if outcome['status'] == 'ok':
+            results[spec['key']] = outcome['result']
+        else:
+            print(f"{spec['name']} not available ({outcome['status']}): {outcome['error']}")
+            results[spec['key']] = (None, "Not available", {})
+    return results
+
+def collect_flagged_pixels(results, geometry, cache_keys=None):
+    """
+    Sample flagged pixels (at most FLAGGED_SAMPLE_CAP per sensor) from the
+    images in `results`, reusing samples cached under the sensors' `cache_keys`.
+    """
+    flagged_coords_vals = []
+    for key, flags in FIELD_FLAGS.items():
+        img = results[key][0]
+        if img is None:
+            continue
+        flagged_coords_vals.extend(flagged_columns_to_records(generate_flagged_areas(
+            img, geometry, flags['bands'], flags['thresholds'], scale=flags['scale'],
+            stats_key=(cache_keys or {}).get(key)
+        )))
+    return flagged_coords_vals
+
+
+# ---- Single round-trip mode
+# Everything a report needs (dates, centre pixel, region stats and flagged
+# samples for every sensor) is built as one ee.Dictionary and fetched with a
+# single getInfo().
+
+def _sensor_summary(spec, geometry, start_date_str, end_date_str):
+    col = ee.ImageCollection(spec['collection']).filterBounds(geometry).filterDate(start_date_str, end_date_str)
+    col = apply_filters(col, spec['filters'])
+    img = ee.Image(col.sort('system:time_start', False).first())
+    if spec['proc_func']:
+        img = spec['proc_func'](img)
+
+    reducer = ee.Reducer.mean().combine(ee.Reducer.stdDev(), sharedInputs=True)
+    summary = ee.Dictionary({
+        'time_start': img.get('system:time_start'),
+        'center': img.reduceRegion(ee.Reducer.first(), geometry.centroid(), spec['scale']),
+        'stats': img.reduceRegion(reducer, geometry, spec['scale'], maxPixels=1e9),
+    })
+    flags = FIELD_FLAGS.get(spec['key'])
+    if flags:
+        summary = summary.set('flagged', flagged_sample_columns(
+            img, flags['bands'], flags['thresholds'], geometry, flags['scale'], FLAGGED_SAMPLE_CAP
+        ))
+    return ee.Algorithms.If(col.size().gt(0), summary, None)
+
+def fetch_report_single_call(geometry, start_date_str, end_date_str):
+    """Fetch every sensor of the report with one getInfo().
+
+    Returns the same (img, date, stats) tuples as the per-sensor path (img is
+    always None, there is nothing left to compute on it) plus the flagged pixels.
+    """
+    report = ee.Dictionary({
+        spec['key']: _sensor_summary(spec, geometry, start_date_str, end_date_str)
+        for spec in SENSORS
+    })
+    info = ee_get_info(report)
+
+    results = {}
+    flagged_coords_vals = []
+    for spec in SENSORS:
+        summary = info.get(spec['key'])
+        if not summary:
+            results[spec['key']] = (None, "Not available", {})
+            continue
+
+        date = format_timestamp(summary['time_start']) if summary.get('time_start') else "Not available"
+        stats = {}
+        center = summary.get('center') or {}
+        for band in spec['bands']:
+            if isinstance(center.get(band), (float, int)):
+                stats[band] = {'mean': center[band]}
+        merge_region_stats(stats, summary.get('stats'))
+        results[spec['key']] = (None, date, stats)
+
+        flags = FIELD_FLAGS.get(spec['key'])
+        if flags:
+            flagged_coords_vals.extend(flagged_columns_to_records(
+                _flagged_columns(summary.get('flagged'), flags['bands'], flags['thresholds'])
+            ))
+    return results, flagged_coords_vals
+
+
+# ---- Local engine mode
+# Raw band chips are downloaded once per scene and field; indices, stats and
+# threshold masks are then computed locally, so re-runs cost no EE calls.
+
+def fetch_report_local(geometry, geometry_geojson, start_date_str, end_date_str):
+    geometry_key = geometry_hash(geometry_geojson)
+    scenes = resolve_latest_scenes(geometry, geometry_key, start_date_str, end_date_str)
+
+    def run(spec):
+        scene = scenes.get(spec['key'])
+        if not scene:
+            return (None, "Not available", {}), []
+        stats, flagged = raster_engine.local_sensor_result(
+            spec, scene, geometry_key, geometry_geojson, FIELD_FLAGS.get(spec['key']), FLAGGED_SAMPLE_CAP
+        )
+        date = format_timestamp(scene['time_start'])
+        return (None, date, stats), (flagged_columns_to_records(flagged) if flagged else [])
+
+    tasks = {
+        spec['key']: (lambda spec=spec: run(spec), spec.get('timeout', SENSOR_TIMEOUT_SECONDS))
+        for spec in SENSORS
+    }
+    outcomes = run_with_deadlines(tasks, max_workers=SENSOR_MAX_WORKERS, name="local-sensor")
+
+    results = {}
+    flagged_coords_vals = []
+    for spec in SENSORS:
+        outcome = outcomes[spec['key']]
+        if outcome['status'] == 'ok':
+            results[spec['key']], flagged = outcome['result']
+            flagged_coords_vals.extend(flagged)
+        else:
+            print(f"{spec['name']} not available ({outcome['status']}): {outcome['error']}")
+            results[spec['key']] = (None, "Not available", {})
+    print(f"Raster chip cache: {raster_engine.cache_counters()}")
+    return results, flagged_coords_vals
+
+
+def analysis_window(utc_now):
+    """90-day window (start, end) as YYYY-MM-DD strings ending at utc_now."""
     dt_now = datetime.strptime(utc_now, '%Y-%m-%d %H:%M:%S').replace(tzinfo=timezone.utc)
     dt_start = dt_now - timedelta(days=90)
-    start_date_str = dt_start.strftime('%Y-%m-%d')
-    end_date_str = dt_now.strftime('%Y-%m-%d')
-
-    # Enhanced satellite data collection using new get_latest function
-    # ---- Sentinel-2
-    s2, s2_date, s2_stats = get_latest(
-        "COPERNICUS/S2_SR_HARMONIZED", geometry, start_date_str, end_date_str,
-        cloud_filter=ee.Filter.lt('CLOUDY_PIXEL_PERCENTAGE', 15),
-        bands=INDEX_BANDS['Sentinel-2'], proc_func=add_indices_s2, scale=10
-    )
-    # print(f"Sentinel-2 stats")
-    
-    # ---- Landsat-8
-    l8, l8_date, l8_stats = get_latest(
-        'LANDSAT/LC08/C02/T1_L2', geometry, start_date_str, end_date_str,
-        cloud_filter=ee.Filter.lt('CLOUD_COVER', 15),
-        bands=INDEX_BANDS['Landsat-8'], proc_func=add_indices_l8, scale=30
-    )
-    
-    # ---- MODIS NDVI/EVI
-    modis, modis_date, modis_stats = get_latest(
-        'MODIS/061/MOD13Q1', geometry, start_date_str, end_date_str,
-        bands=['NDVI', 'EVI'], scale=500
+    return dt_start.strftime('%Y-%m-%d'), dt_now.strftime('%Y-%m-%d')
+
+def latest_scene_ids(geometry_geojson, utc_now):
+    """sensor key -> id of the newest scene over the field (or None), from the scene catalog."""
+    ensure_ee()
+    start_date_str, end_date_str = analysis_window(utc_now)
+    scenes = resolve_latest_scenes(
+        ee.Geometry.Polygon(geometry_geojson), geometry_hash(geometry_geojson), start_date_str, end_date_str
     )
-    
-    # ---- MODIS LAI/FPAR
-    modis_lai, modis_lai_date, modis_lai_stats = get_latest(
-        'MODIS/061/MOD15A2H', geometry, start_date_str, end_date_str,
-        bands=['Lai_500m', 'Fpar_500m'], scale=500
-    )
-    
-    # ---- MODIS Land Surface Temperature
-    modis_temp, modis_temp_date, modis_temp_stats = get_latest(
-        'MODIS/061/MOD11A1', geometry, start_date_str, end_date_str,
-        bands=['LST_Day_1km'], scale=1000
-    )
-    
-    # ---- Sentinel-1 SAR
-    s1, s1_date, s1_stats = get_latest(
-        'COPERNICUS/S1_GRD', geometry, start_date_str, end_date_str,
-        cloud_filter=ee.Filter.eq('instrumentMode', 'IW'),
-        bands=INDEX_BANDS['Sentinel-1'], proc_func=add_sar_indices, scale=10
+    return {key: scene['id'] if scene else None for key, scene in scenes.items()}
+
+def fetch_satellite_results(geometry_geojson, utc_now, mode=None, timings=None, cache_keys=None):
+    """
+    Satellite stage of a report: per-sensor (img, date, stats) results for the
+    field. Returns (results, flagged_coords_vals, ee_calls); flagged_coords_vals
+    is None in per_sensor mode, where flagged pixels are a separate step
+    (flagged_pixels_for) on the returned images. Per-sensor timings go to
+    `timings` and stats cache keys, for that step, to `cache_keys`.
+    """
+    mode = mode or SATELLITE_REPORT_MODE
+    ensure_ee()
+    geometry = ee.Geometry.Polygon(geometry_geojson)
+    start_date_str, end_date_str = analysis_window(utc_now)
+
+    flagged_coords_vals = None
+    with count_ee_calls() as ee_calls:
+        if mode == "single_call":
+            try:
+                results, flagged_coords_vals = fetch_report_single_call(geometry, start_date_str, end_date_str)
+            except Exception as e:
+                print(f"Error fetching single-call satellite report: {e}")
+                results = {spec['key']: (None, "Not available", {}) for spec in SENSORS}
+                flagged_coords_vals = []
+        elif mode == "local":
+            try:
+                results, flagged_coords_vals = fetch_report_local(
+                    geometry, geometry_geojson, start_date_str, end_date_str
+                )
+            except Exception as e:
+                print(f"Error computing local satellite report: {e}")
+                results = {spec['key']: (None, "Not available", {}) for spec in SENSORS}
+                flagged_coords_vals = []
+        else:
+            # Enhanced satellite data collection using new get_latest function
+            geometry_key = geometry_hash(geometry_geojson)
+            scenes = None
+            if SATELLITE_CACHE and SCENE_CATALOG:
+                try:
+                    scenes = resolve_latest_scenes(geometry, geometry_key, start_date_str, end_date_str)
+                except Exception as e:
+                    print(f"Scene catalog lookup failed, asking EE per sensor: {e}")
+            results = fetch_sensors(
+                geometry, start_date_str, end_date_str, geometry_key=geometry_key, scenes=scenes,
+                timings=timings, cache_keys=cache_keys
+            )
+    print(f"Earth Engine calls for satellite results ({mode}): {ee_calls['calls']}")
+    if SATELLITE_CACHE:
+        print(f"Satellite stats cache: {cache_stats()}")
+    return results, flagged_coords_vals, ee_calls['calls']
+
+def flagged_pixels_for(results, geometry_geojson, cache_keys=None):
+    """
+    Flagged-pixel stage for per_sensor results: (flagged_coords_vals, ee_calls)
+    sampled from the sensor images, or from the satellite cache for the
+    `cache_keys` filled in by fetch_satellite_results.
+    """
+    with count_ee_calls() as ee_calls:
+        flagged_coords_vals = collect_flagged_pixels(results, ee.Geometry.Polygon(geometry_geojson), cache_keys)
+    return flagged_coords_vals, ee_calls['calls']
+
+def generate_multisatellite_report(geometry_geojson, user_login, utc_now, mode=None, history=None):
+    start_date_str, end_date_str = analysis_window(utc_now)
+    cache_keys = {}
+    results, flagged_coords_vals, ee_calls = fetch_satellite_results(geometry_geojson, utc_now, mode, cache_keys=cache_keys)
+    if flagged_coords_vals is None:
+        try:
+            flagged_coords_vals, flagged_calls = flagged_pixels_for(results, geometry_geojson, cache_keys)
+            ee_calls += flagged_calls
+        except Exception as e:
+            print(f"Error generating flagged areas: {e}")
+            flagged_coords_vals = []
+
+    return build_satellite_report(
+        results, flagged_coords_vals, user_login, utc_now, start_date_str, end_date_str,
+        ee_calls=ee_calls, history=history
     )
-    # print (f"Sentinel-1 stats")
+
+def satellite_interpretation(results, history=None):
+    """Status flags and agronomic interpretation of the per-sensor stats (plus trends from `history`)."""
+    _, s2_date, s2_stats = results['sentinel2']
+    _, l8_date, l8_stats = results['landsat8']
+    prev_stats = previous_stats(history, {key: result[1] for key, result in results.items()})
+    text = "\n" + generate_interpretation(s2_stats, l8_stats, s2_date, l8_date) + "\n"
+    text += "\n" + generate_deep_interpretation(
+        s2_stats, l8_stats, results['sentinel1'][2], results['modis_ndvi_evi'][2],
+        results['modis_lai'][2], results['modis_lst'][2], prev_stats
+    ) + "\n"
+    return text
+
+def flagged_area_section(flagged_coords_vals):
+    """(interpretation text, flagged_coords_vals) for the flagged-pixel part of the report."""
+    try:
+        if flagged_coords_vals is None:
+            return "Pixel-level flagged areas were not sampled for this report.", []
+        if not flagged_coords_vals:
+            return NO_FLAGGED_PIXELS_MESSAGE, flagged_coords_vals
+        return generate_flagged_area_interpretation(flagged_coords_vals), flagged_coords_vals
+    except Exception as e:
+        print(f"Error generating flagged areas: {e}")
+        return "No flagged areas found ", []
+
+def build_satellite_report(results, flagged_coords_vals, user_login, utc_now, start_date_str, end_date_str, ee_calls=None, history=None, interpretation=None, flagged_section=None):
+    """
+    Turn per-sensor (img, date, stats) results into
+    [llm_text_report, raw_details, flagged_coords_vals, metadata].
+    Pass flagged_coords_vals=None when pixel-level flags were not sampled, and
+    the field's stored history (field_timeseries.load_recent_stats) for trends.
+    `interpretation` / `flagged_section` take already computed
+    satellite_interpretation / flagged_area_section output.
+    """
+    s2_date = results['sentinel2'][1]
+    l8_date = results['landsat8'][1]
+    modis_date = results['modis_ndvi_evi'][1]
+    modis_lai_date = results['modis_lai'][1]
+    modis_temp_date = results['modis_lst'][1]
+    s1_date = results['sentinel1'][1]
 
     llm_text_report = f"""
 # Comprehensive Multi-Satellite Crop & Field Health Report
@@ -829,76 +1334,27 @@ def generate_multisatellite_report(geometry_geojson, user_login, utc_now):
 ## Field Status Flags  
 """
 
-    llm_text_report += "\n" + generate_interpretation(s2_stats, l8_stats, s2_date, l8_date) + "\n"
-    test2 = generate_deep_interpretation(s2_stats, l8_stats, s1_stats, modis_stats, modis_lai_stats, modis_temp_stats)
-    llm_text_report += "\n" + test2 + "\n"
-
-    s2_flagged = get_field_issue_flags(s2_stats, ['NDVI', 'NDWI', 'NDRE'], [
-        (None, 0.2, "NDVI low: possible sparse or stressed vegetation"),
-        (None, 0.1, "NDWI low: likely dry/drought stress"),
-        (None, 0.1, "NDRE low: potential N deficiency"),
-    ])
-    l8_flagged = get_field_issue_flags(l8_stats, ['NDVI', 'NDWI'], [
-        (None, 0.2, "NDVI low: sparse or failed zones"),
-        (None, 0.1, "NDWI low: water deficit"),
-    ])
-
-    try:
-
-
-        flagged_areas = []
-        flagged_areas.extend(s2_flagged)
-        flagged_areas.extend(l8_flagged)
+    if interpretation is None:
+        interpretation = satellite_interpretation(results, history)
+    llm_text_report += interpretation
 
-        flagged_coords_vals = []
-        flagged_coords_vals.extend(generate_flagged_areas(s2, geometry, ['NDVI', 'NDWI', 'NDRE'], [
-            (None, 0.2, "NDVI low: possible sparse or stressed vegetation"),
-            (None, 0.1, "NDWI low: likely dry/drought stress"),
-            (None, 0.1, "NDRE low: potential N deficiency"),
-        ], scale=10)[:10])
-
-        if l8 is not None:
-            flagged_coords_vals.extend(generate_flagged_areas(l8, geometry, ['NDVI', 'NDWI'], [
-                (None, 0.2, "NDVI low: sparse or failed zones"),
-                (None, 0.1, "NDWI low: water deficit"),
-            ], scale=30)[:10])
-
-        if (flagged_coords_vals[0].get("message") == "No flagged pixels found. Everything is within healthy thresholds."):
-            interpretation = flagged_coords_vals[0]["message"]
-        else:
-            interpretation = generate_flagged_area_interpretation(flagged_coords_vals)
-        # llm_text_report += "\n" + interpretation + "\n"
-    except Exception as e:
-        print(f"Error generating flagged areas: {e}")
-        # llm_text_report += "\nError generating flagged areas: " + str(e) + "\n"
-        interpretation = "No flagged areas found "
-        flagged_coords_vals = []
-    llm_text_report += "\n" + interpretation + "\n"
+    if flagged_section is None:
+        flagged_section = flagged_area_section(flagged_coords_vals)
+    flagged_text, flagged_coords_vals = flagged_section
+    llm_text_report += "\n" + flagged_text + "\n"
     
 
     metadata = {
         'user': user_login,
         'analysis_date_utc': utc_now,
         'analysis_period': {'start': start_date_str, 'end': end_date_str},
-        'satellite_sources': {
-            'Sentinel-2': s2_date,
-            'Sentinel-1': s1_date,
-            'Landsat 8': l8_date,
-            'MODIS NDVI/EVI': modis_date,
-            'MODIS LAI': modis_lai_date,
-            'MODIS LST': modis_temp_date
-        }
+        'satellite_sources': {spec['name']: results[spec['key']][1] for spec in SENSORS},
+        'ee_calls': ee_calls
     }
-    # interpretation = generate_flagged_area_interpretation(flagged_coords_vals)
-    
 
     raw_details = {
-        'sentinel2': {'stats': s2_stats, 'date': s2_date},
-        'sentinel1': {'stats': s1_stats, 'date': s1_date},
-        'landsat8': {'stats': l8_stats, 'date': l8_date},
-        'modis_ndvi_evi': {'stats': modis_stats, 'date': modis_date},
-        'modis_lai': {'stats': modis_lai_stats, 'date': modis_lai_date},
-        'modis_lst': {'stats': modis_temp_stats, 'date': modis_temp_date}
+        spec['key']: {'stats': results[spec['key']][2], 'date': results[spec['key']][1]}
+        for spec in SENSORS
     }
 
     return [llm_text_report, raw_details, flagged_coords_vals, metadata]
@@ -0,0 +1,80 @@
+import os
+import threading
+from datetime import datetime, timedelta
+from database import scene_catalog_collection
+
+# A footprint's catalog entry is trusted for this long before EE is asked again
+SCENE_CATALOG_REFRESH_HOURS = float(os.environ.get("SCENE_CATALOG_REFRESH_HOURS", 6))
+
+_lock = threading.Lock()
+_entries = {}  # "collection|footprint" -> catalog entry
+_loaded = False
+
+
+def catalog_key(collection_id, footprint):
+    return f"{collection_id}|{footprint}"
+
+
+def _load():
+    """Pull the persisted catalog into memory once per process."""
+    global _loaded
+    if _loaded:
+        return
+    with _lock:
+        if _loaded:
+            return
+        try:
+            for doc in scene_catalog_collection.find({}):
+                _entries[doc["_id"]] = doc
+        except Exception as e:
+            print(f"Could not load scene catalog: {e}")
+        _loaded = True
+
+
+def get_entry(collection_id, footprint):
+    _load()
+    return _entries.get(catalog_key(collection_id, footprint))
+
+
+def needs_refresh(entry, now=None):
+    if not entry:
+        return True
+    now = now or datetime.now()
+    return now - entry["refreshed_at"] > timedelta(hours=SCENE_CATALOG_REFRESH_HOURS)
+
+
+def refresh_since(entry, default_start):
+    """
+    Start of the incremental query window: only scenes acquired at or after the
+    newest one we already know about can replace it.
+    """
+    if entry and entry.get("time_start"):
+        return datetime.utcfromtimestamp(entry["time_start"] / 1000).strftime('%Y-%m-%d')
+    return default_start
+
+
+def record_refresh(collection_id, footprint, scene, now=None):
+    """Store the outcome of a refresh; `scene` is {'id', 'index', 'time_start'} or None."""
+    now = now or datetime.now()
+    key = catalog_key(collection_id, footprint)
+    with _lock:
+        entry = dict(_entries.get(key) or {"_id": key, "collection": collection_id, "footprint": footprint})
+        if scene and scene.get("time_start") and scene["time_start"] >= (entry.get("time_start") or 0):
+            entry.update({"scene_id": scene["id"], "scene_index": scene["index"], "time_start": scene["time_start"]})
+        entry["refreshed_at"] = now
+        _entries[key] = entry
+    try:
+        scene_catalog_collection.replace_one({"_id": key}, entry, upsert=True)
+    except Exception as e:
+        print(f"Could not persist scene catalog entry {key}: {e}")
+    return entry
+
+
+def latest_scene(collection_id, footprint, start_date_str):
+    """The newest known scene for the footprint inside the report window, or None."""
+    entry = get_entry(collection_id, footprint)
+    if not entry or not entry.get("scene_id"):
+        return None
+    if datetime.utcfromtimestamp(entry["time_start"] / 1000).strftime('%Y-%m-%d') < start_date_str:
+        return None
+    return {"id": entry["scene_id"], "index": entry["scene_index"], "time_start": entry["time_start"]}
@@ -0,0 +1,132 @@
+import hashlib
+import json
+import os
+import threading
+from datetime import datetime
+from pymongo import ASCENDING
+from database import satellite_cache_collection
+
+# Cached get_latest results expire after this many days (Mongo TTL index)...
+SATELLITE_CACHE_TTL_DAYS = float(os.environ.get("SATELLITE_CACHE_TTL_DAYS", 30))
+# ...and the least recently used entries are dropped beyond this many documents
+SATELLITE_CACHE_MAX_ENTRIES = int(os.environ.get("SATELLITE_CACHE_MAX_ENTRIES", 50000))
+# Size check runs every N writes rather than on every insert
+_EVICTION_CHECK_EVERY = 100
+
+_lock = threading.Lock()
+_counters = {"hits": 0, "misses": 0, "writes": 0, "evictions": 0, "flagged_hits": 0, "flagged_misses": 0}
+_indexes_ready = False
+
+
+def geometry_hash(geometry_geojson, precision=6):
+    """
+    Stable hash of a polygon ring: coordinates rounded, closing vertex dropped,
+    ring rotated to start at its smallest vertex and oriented counter-clockwise,
+    so the same field always hashes the same however its corners were listed.
+    """
+    ring = [(round(float(x), precision), round(float(y), precision)) for x, y in geometry_geojson]
+    if len(ring) > 1 and ring[0] == ring[-1]:
+        ring = ring[:-1]
+    signed_area = sum(x1 * y2 - x2 * y1 for (x1, y1), (x2, y2) in zip(ring, ring[1:] + ring[:1]))
+    if signed_area < 0:
+        ring = ring[::-1]
+    start = ring.index(min(ring))
+    ring = ring[start:] + ring[:start]
+    return hashlib.sha1(json.dumps(ring).encode()).hexdigest()
+
+
+def cache_key(collection_id, scene_index, geom_hash, scale):
+    return f"{collection_id}|{scene_index}|{geom_hash}|{scale}"
+
+
+def _ensure_indexes():
+    global _indexes_ready
+    if _indexes_ready:
+        return
+    satellite_cache_collection.create_index(
+        [("created_at", ASCENDING)], expireAfterSeconds=int(SATELLITE_CACHE_TTL_DAYS * 86400)
+    )
+    satellite_cache_collection.create_index([("last_used", ASCENDING)])
+    _indexes_ready = True
+
+
+def _count(name, n=1):
+    with _lock:
+        _counters[name] += n
+        return _counters[name]
+
+
+def get_cached_stats(key):
+    """Return {'date', 'stats'} for a cached result, or None."""
+    try:
+        _ensure_indexes()
+        doc = satellite_cache_collection.find_one_and_update(
+            {"_id": key}, {"$set": {"last_used": datetime.now()}}, projection={"date": 1, "stats": 1}
+        )
+    except Exception as e:
+        print(f"Satellite cache lookup failed: {e}")
+        doc = None
+    _count("hits" if doc else "misses")
+    return doc
+
+
+def put_cached_stats(key, collection_id, scene_index, geom_hash, scale, date, stats):
+    try:
+        _ensure_indexes()
+        now = datetime.now()
+        satellite_cache_collection.replace_one({"_id": key}, {
+            "collection": collection_id,
+            "scene_index": scene_index,
+            "geometry_hash": geom_hash,
+            "scale": scale,
+            "date": date,
+            "stats": stats,
+            "created_at": now,
+            "last_used": now
+        }, upsert=True)
+        if _count("writes") % _EVICTION_CHECK_EVERY == 0:
+            evict_over_limit()
+    except Exception as e:
+        print(f"Satellite cache write failed: {e}")
+
+
+def get_cached_flagged(key, max_samples):
+    """Flagged-pixel columns stored with the stats under key (sampled with the same cap), or None."""
+    try:
+        doc = satellite_cache_collection.find_one({"_id": key}, {"flagged": 1, "flagged_cap": 1})
+    except Exception as e:
+        print(f"Satellite cache lookup failed: {e}")
+        doc = None
+    columns = doc.get("flagged") if doc and doc.get("flagged_cap") == max_samples else None
+    _count("flagged_hits" if columns is not None else "flagged_misses")
+    return columns
+
+
+def put_cached_flagged(key, max_samples, columns):
+    """Store flagged-pixel columns next to the cached stats of the same scene, field and scale."""
+    try:
+        satellite_cache_collection.update_one(
+            {"_id": key}, {"$set": {"flagged": columns, "flagged_cap": max_samples}}
+        )
+    except Exception as e:
+        print(f"Satellite cache write failed: {e}")
+
+
+def evict_over_limit():
+    """Drop least recently used entries beyond SATELLITE_CACHE_MAX_ENTRIES."""
+    excess = satellite_cache_collection.estimated_document_count() - SATELLITE_CACHE_MAX_ENTRIES
+    if excess <= 0:
+        return 0
+    stale = satellite_cache_collection.find({}, {"_id": 1}).sort("last_used", ASCENDING).limit(excess)
+    ids = [doc["_id"] for doc in stale]
+    removed = satellite_cache_collection.delete_many({"_id": {"$in": ids}}).deleted_count
+    _count("evictions", removed)
+    return removed
+
+
+def cache_stats():
+    with _lock:
+        counters = dict(_counters)
+    lookups = counters["hits"] + counters["misses"]
+    counters["hit_rate"] = counters["hits"] / lookups if lookups else None
+    return counters
@@ -0,0 +1,58 @@
+import contextvars
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+
+def run_with_deadlines(tasks, max_workers=4, default_timeout=60, name="task"):
+    """
+    Run independent callables concurrently, each with its own deadline.
+
+    - tasks: dict of name -> callable, or name -> (callable, timeout_seconds)
+    - max_workers: parallelism cap
+    - default_timeout: deadline for tasks that do not set their own
+
+    A task's deadline starts when a worker picks it up, so tasks waiting behind
+    the parallelism cap are not penalised. Returns name -> {"status", "result",
+    "error", "seconds"} where status is "ok", "error" or "timeout". Timed out
+    work cannot be interrupted; it is abandoned and its result ignored.
+    """
+    started = {}
+    results = {}
+
+    def run(key, fn):
+        started[key] = time.monotonic()
+        return fn()
+
+    executor = ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix=name)
+    futures = {}
+    timeouts = {}
+    for key, task in tasks.items():
+        fn, timeout = task if isinstance(task, tuple) else (task, None)
+        timeouts[key] = timeout or default_timeout
+        # copy_context keeps ContextVars (e.g. the EE call counter) visible in the worker
+        futures[executor.submit(contextvars.copy_context().run, run, key, fn)] = key
+
+    pending = set(futures)
+    try:
+        while pending:
+            done, pending = wait(pending, timeout=0.25, return_when=FIRST_COMPLETED)
+            now = time.monotonic()
+            for fut in done:
+                key = futures[fut]
+                elapsed = now - started.get(key, now)
+                try:
+                    results[key] = {"status": "ok", "result": fut.result(), "error": None, "seconds": elapsed}
+                except Exception as e:
+                    results[key] = {"status": "error", "result": None, "error": str(e), "seconds": elapsed}
+            for fut in list(pending):
+                key = futures[fut]
+                if key in started and now - started[key] > timeouts[key]:
+                    pending.discard(fut)
+                    fut.cancel()
+                    results[key] = {
+                        "status": "timeout", "result": None,
+                        "error": f"timed out after {timeouts[key]}s", "seconds": now - started[key]
+                    }
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+    return results
@@ -0,0 +1,13 @@
+import os
+
+# Token counts are estimated from text length; no tokenizer is loaded
+CHARS_PER_TOKEN = float(os.environ.get("CHARS_PER_TOKEN", 4))
+
+
+def approx_tokens(text):
+    return int(len(text) / CHARS_PER_TOKEN) + 1 if text else 0
+
+
+def approx_token_ids(text):
+    """Stand-in token ids of the estimated length, for LangChain's custom_get_token_ids."""
+    return [0] * approx_tokens(text)
@@ -0,0 +1,89 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class TTLCache:
+    """
+    Thread-safe in-process cache with a per-entry TTL and LRU eviction beyond
+    max_entries. get_or_load coalesces concurrent misses for the same key, so
+    only one caller runs the loader and the rest wait for its result.
+    """
+
+    def __init__(self, ttl_seconds, max_entries=1024, name="cache"):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.name = name
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        self._inflight = {}            # key -> {"event", "done", "value"} of the running load
+        self._lock = threading.Lock()
+        self._counters = {"hits": 0, "misses": 0, "coalesced": 0, "evictions": 0}
+
+    def _get_locked(self, key, now):
+        entry = self._entries.get(key)
+        if entry is None:
+            return False, None
+        if entry[0] <= now:
+            del self._entries[key]
+            return False, None
+        self._entries.move_to_end(key)
+        return True, entry[1]
+
+    def get(self, key, default=None):
+        with self._lock:
+            found, value = self._get_locked(key, time.monotonic())
+            return value if found else default
+
+    def put(self, key, value, ttl_seconds=None):
+        ttl = self.ttl_seconds if ttl_seconds is None else ttl_seconds
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._counters["evictions"] += 1
+
+    def get_or_load(self, key, loader, cache_if=None):
+        """
+        Cached value for key, else loader(), run once across concurrent callers
+        who all get its result. A result for which cache_if(result) is false is
+        returned but not cached. If the loader raises, waiting callers retry.
+        """
+        while True:
+            with self._lock:
+                found, value = self._get_locked(key, time.monotonic())
+                if found:
+                    self._counters["hits"] += 1
+                    return value
+                flight = self._inflight.get(key)
+                if flight is None:
+                    flight = self._inflight[key] = {"event": threading.Event(), "done": False, "value": None}
+                    self._counters["misses"] += 1
+                    break
+                self._counters["coalesced"] += 1
+            flight["event"].wait()
+            if flight["done"]:
+                return flight["value"]
+
+        try:
+            value = loader()
+            if cache_if is None or cache_if(value):
+                self.put(key, value)
+            flight["value"], flight["done"] = value, True
+            return value
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            flight["event"].set()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            counters = dict(self._counters)
+            counters["entries"] = len(self._entries)
+        lookups = counters["hits"] + counters["misses"] + counters["coalesced"]
+        counters["hit_rate"] = (counters["hits"] + counters["coalesced"]) / lookups if lookups else None
+        return counters
@@ -1,43 +1,166 @@
-import requests
+import math
+import os
+from datetime import datetime, timedelta
+from ttl_cache import TTLCache
+from database import forecast_collection
+from weather_client import build_providers, fetch_readings, PROVIDER_TYPES
 
 # --- API KEYS ---
 
-TOMORROW_API_KEY = "uyGFzqaXSuQ7abQpG1d8ASPzsREIgoQ8"
+TOMORROW_API_KEY = os.environ.get("TOMORROW_API_KEY", "uyGFzqaXSuQ7abQpG1d8ASPzsREIgoQ8")
+# Point at weather_stub_server.py for offline benchmarks
+TOMORROW_BASE_URL = os.environ.get("TOMORROW_BASE_URL", "https://api.tomorrow.io")
 
-def fetch_tomorrow_io(lat, lon):
+# Providers queried in parallel for every reading (see weather_client.PROVIDER_TYPES)
+WEATHER_PROVIDERS = os.environ.get("WEATHER_PROVIDERS", "tomorrow_io")
+providers = build_providers(WEATHER_PROVIDERS, tomorrow_io={"api_key": TOMORROW_API_KEY, "base_url": TOMORROW_BASE_URL})
+
+# Step each reading is rounded to when deciding whether the weather has changed
+WEATHER_QUANTA = {
+    "temperature": 1.0,
+    "humidity": 5.0,
+    "rain_probability": 10.0,
+    "soil_moisture": 0.02,
+    "evapotranspiration": 0.5,
+    "rain_next_24h": 10.0
+}
+
+# Reports read weather from the forecasts stored by weather_forecast.prefetch_forecasts;
+# a stored forecast older than this is ignored...
+WEATHER_FORECAST_MAX_AGE_HOURS = float(os.environ.get("WEATHER_FORECAST_MAX_AGE_HOURS", 72))
+# ...and only then, if enabled, is the realtime endpoint called instead
+WEATHER_REALTIME_FALLBACK = os.environ.get("WEATHER_REALTIME_FALLBACK", "1") == "1"
+
+# Fields are bucketed into square grid cells of this many degrees (~2 km at
+# 0.02); every field in a cell shares one realtime reading, fetched at the
+# cell centre and cached for WEATHER_CACHE_TTL_SECONDS
+WEATHER_GRID_DEG = float(os.environ.get("WEATHER_GRID_DEG", 0.02))
+WEATHER_CACHE_TTL_SECONDS = float(os.environ.get("WEATHER_CACHE_TTL_SECONDS", 1800))
+WEATHER_CACHE_MAX_CELLS = int(os.environ.get("WEATHER_CACHE_MAX_CELLS", 20000))
+
+weather_cache = TTLCache(WEATHER_CACHE_TTL_SECONDS, WEATHER_CACHE_MAX_CELLS, name="weather")
+
+def weather_cell(lat, lon):
+    """Grid cell (row, col) containing the point."""
+    return math.floor(float(lat) / WEATHER_GRID_DEG), math.floor(float(lon) / WEATHER_GRID_DEG)
+
+def cell_center(cell):
+    row, col = cell
+    return round((row + 0.5) * WEATHER_GRID_DEG, 6), round((col + 0.5) * WEATHER_GRID_DEG, 6)
+
+def cell_key(cell):
+    return f"{cell[0]}:{cell[1]}"
+
+def parse_forecast_time(value):
+    """ISO timestamp from a provider as a naive UTC datetime."""
+    parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    return parsed.replace(tzinfo=None) - (parsed.utcoffset() or timedelta(0))
+
+def forecast_readings(doc, now=None):
+    """
+    Readings (provider name -> values) for `now` from a stored forecast
+    document: the current hour's values plus the highest rain probability over
+    the next 24 and 72 hours.
+    """
+    now = now or datetime.utcnow()
+    readings = {}
+    for name, forecast in doc.get("providers", {}).items():
+        hourly = forecast.get("hourly", [])
+        if not hourly:
+            continue
+        current = hourly[0]
+        for step in hourly:
+            if step["time"] > now:
+                break
+            current = step
+        upcoming = [
+            (step["time"], step["values"].get("rain_probability")) for step in hourly
+            if now < step["time"] and isinstance(step["values"].get("rain_probability"), (int, float))
+        ]
+        values = dict(current["values"])
+        values["rain_next_24h"] = max((p for t, p in upcoming if t <= now + timedelta(hours=24)), default="N/A")
+        values["rain_next_72h"] = max((p for t, p in upcoming if t <= now + timedelta(hours=72)), default="N/A")
+        values["forecast_fetched_at"] = doc["fetched_at"].strftime('%Y-%m-%d %H:%M UTC')
+        readings[name] = values
+    return readings or None
+
+def stored_weather_values(cell, now=None):
+    """Readings for the cell from its stored forecast, or None if there is no recent one."""
+    now = now or datetime.utcnow()
+    doc = forecast_collection.find_one({"_id": cell_key(cell)})
+    if not doc or now - doc["fetched_at"] > timedelta(hours=WEATHER_FORECAST_MAX_AGE_HOURS):
+        return None
+    return forecast_readings(doc, now)
+
+def get_weather_values(lat, lon):
+    """
+    Readings (provider name -> values) for the point's grid cell, from the
+    stored forecast when there is one; otherwise one realtime upstream fan-out
+    per cell per TTL (if WEATHER_REALTIME_FALLBACK), cached unless every
+    provider failed.
+    """
+    cell = weather_cell(lat, lon)
+
+    def load():
+        try:
+            readings = stored_weather_values(cell)
+        except Exception as e:
+            print(f"Could not read stored forecast for cell {cell_key(cell)}: {e}")
+            readings = None
+        if readings:
+            return readings
+        if WEATHER_REALTIME_FALLBACK:
+            return fetch_weather(*cell_center(cell))
+        return {provider.name: {"error": f"No stored {provider.label} forecast for this location yet"} for provider in providers}
+
+    return weather_cache.get_or_load(
+        cell, load, cache_if=lambda readings: any("error" not in values for values in readings.values())
+    )
+
+def fetch_weather(lat, lon):
+    """Query all configured providers in parallel: provider name -> values or {'error': ...}."""
     try:
-        url = f"https://api.tomorrow.io/v4/weather/realtime?location={lat},{lon}&apikey={TOMORROW_API_KEY}"
-        response = requests.get(url)
-        response.raise_for_status()
-        data = response.json().get("data", {}).get("values", {})
-        return {
-            "temperature": data.get("temperature", "N/A"),
-            "humidity": data.get("humidity", "N/A"),
-            "rain_probability": data.get("precipitationProbability", "N/A"),
-            "soil_moisture": data.get("soilMoistureVolumetric0To10cm", "N/A"),
-            "evapotranspiration": data.get("evapotranspiration", "N/A")
-        }
+        return fetch_readings(providers, lat, lon)
     except Exception as e:
-        return {"error": f"Tomorrow.io error: {str(e)}"}
+        return {provider.name: {"error": f"{provider.label} error: {str(e)}"} for provider in providers}
 
-# --- MAIN FUNCTION (Agent-friendly) ---
-def get_weather_info(lat, lon) -> str:
-    tomorrow = fetch_tomorrow_io(lat, lon)
+def quantize_weather(readings):
+    """Readings rounded to WEATHER_QUANTA, so small fluctuations compare equal."""
+    quantized = {}
+    for name, values in readings.items():
+        if "error" in values:
+            quantized[name] = {"error": True}
+            continue
+        quantized[name] = {
+            key: round(round(values[key] / step) * step, 4) if isinstance(values.get(key), (int, float)) else None
+            for key, step in WEATHER_QUANTA.items()
+        }
+    return quantized
 
+def format_weather_report(readings) -> str:
     report = f"\nCombined Weather Insights for the field location are following:\n"
 
-    if "error" not in tomorrow:
+    for name, values in readings.items():
+        if "error" in values:
+            continue
+        label = PROVIDER_TYPES[name].label if name in PROVIDER_TYPES else name
         report += f"""
-🛰️ Tomorrow.io:
-- Temp: {tomorrow['temperature']}°C
-- Humidity: {tomorrow['humidity']}%
-- Rain Probability: {tomorrow['rain_probability']}%
-{"- Soil Moisture: "+tomorrow['soil_moisture']+" m³/m³" if tomorrow['soil_moisture']!="N/A" else ""}
-{"- Evapotranspiration: "+tomorrow['evapotranspiration']+" mm/day" if tomorrow['evapotranspiration']!="N/A" else ""}"""
+🛰️ {label}:
+- Temp: {values['temperature']}°C
+- Humidity: {values['humidity']}%
+- Rain Probability: {values['rain_probability']}%
+{f"- Soil Moisture: {values['soil_moisture']} m³/m³" if values['soil_moisture']!="N/A" else ""}
+{f"- Evapotranspiration: {values['evapotranspiration']} mm/day" if values['evapotranspiration']!="N/A" else ""}"""
+        if values.get("rain_next_24h", "N/A") != "N/A":
+            report += f"\n- Max Rain Probability (next 24h): {values['rain_next_24h']}%"
+        if values.get("rain_next_72h", "N/A") != "N/A":
+            report += f"\n- Max Rain Probability (next 72h): {values['rain_next_72h']}%"
+        if values.get("forecast_fetched_at"):
+            report += f"\n- (from forecast fetched {values['forecast_fetched_at']})"
 
     # Add any API errors
-    for api_response in [tomorrow]:
+    for api_response in readings.values():
         if "error" in api_response:
             report += f"\n\n⚠️ {api_response['error']}"
 
-    return report
\ No newline at end of file
+    return report
@@ -0,0 +1,63 @@
+"""
+Throughput and tail latency of the weather provider client against
+weather_stub_server.py (or any Tomorrow.io compatible base URL).
+
+    python weather_stub_server.py --latency-ms 80 --jitter-ms 40 &
+    python weather_benchmark.py --requests 2000 --concurrency 50
+"""
+import argparse
+import asyncio
+import random
+import time
+from weather_client import TomorrowIOProvider, WeatherClient
+
+
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, int(round(q * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+async def run(args):
+    client = WeatherClient(
+        timeout=args.timeout, retries=args.retries,
+        max_concurrency=args.concurrency, max_connections=args.connections
+    )
+    provider = TomorrowIOProvider(api_key="benchmark", base_url=args.base_url)
+    latencies, errors = [], 0
+
+    async def one():
+        nonlocal errors
+        lat, lon = 20 + random.random() * 10, 72 + random.random() * 10
+        started = time.perf_counter()
+        readings = await client.fetch_all([provider], lat, lon)
+        latencies.append(time.perf_counter() - started)
+        if "error" in readings[provider.name]:
+            errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(args.requests)))
+    elapsed = time.perf_counter() - started
+    await client.aclose()
+
+    latencies.sort()
+    print(f"requests={args.requests} concurrency={args.concurrency} errors={errors}")
+    print(f"throughput={args.requests / elapsed:.1f} req/s  wall={elapsed:.2f}s")
+    for q in (0.5, 0.9, 0.99, 1.0):
+        print(f"p{int(q * 100)}={percentile(latencies, q) * 1000:.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://127.0.0.1:8765")
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--connections", type=int, default=20)
+    parser.add_argument("--timeout", type=float, default=10.0)
+    parser.add_argument("--retries", type=int, default=2)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,219 @@
+import asyncio
+from abc import ABC, abstractmethod
+import os
+import random
+import threading
+import httpx
+
+# Shared async HTTP layer for weather providers: one pooled httpx client on a
+# background event loop, so report threads reuse connections instead of doing
+# a TLS handshake per call. Every request has a timeout, transient failures
+# are retried with backoff, and in-flight requests are capped.
+
+WEATHER_HTTP_TIMEOUT_SECONDS = float(os.environ.get("WEATHER_HTTP_TIMEOUT_SECONDS", 10))
+WEATHER_HTTP_RETRIES = int(os.environ.get("WEATHER_HTTP_RETRIES", 2))
+WEATHER_HTTP_BACKOFF_SECONDS = float(os.environ.get("WEATHER_HTTP_BACKOFF_SECONDS", 0.5))
+WEATHER_HTTP_MAX_CONCURRENCY = int(os.environ.get("WEATHER_HTTP_MAX_CONCURRENCY", 20))
+WEATHER_HTTP_MAX_CONNECTIONS = int(os.environ.get("WEATHER_HTTP_MAX_CONNECTIONS", 20))
+
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+class WeatherProvider(ABC):
+    """
+    A weather source. fetch() returns the readings dict used by
+    weather.format_weather_report; fetch_forecast() returns
+    {'hourly': [{'time', 'values'}], 'daily': [{'time', 'values'}]} with times
+    as ISO strings and hourly values in the same keys as fetch(). A subclass
+    missing either method cannot be instantiated.
+    """
+    name = "provider"
+    label = "Provider"
+
+    @abstractmethod
+    async def fetch(self, client, lat, lon):
+        ...
+
+    @abstractmethod
+    async def fetch_forecast(self, client, lat, lon):
+        ...
+
+
+class TomorrowIOProvider(WeatherProvider):
+    name = "tomorrow_io"
+    label = "Tomorrow.io"
+
+    def __init__(self, api_key, base_url="https://api.tomorrow.io"):
+        self.api_key = api_key
+        self.base_url = base_url.rstrip("/")
+
+    async def fetch(self, client, lat, lon):
+        payload = await client.get_json(
+            f"{self.base_url}/v4/weather/realtime",
+            params={"location": f"{lat},{lon}", "apikey": self.api_key}
+        )
+        return self._values(payload.get("data", {}).get("values", {}))
+
+    async def fetch_forecast(self, client, lat, lon):
+        payload = await client.get_json(
+            f"{self.base_url}/v4/weather/forecast",
+            params={"location": f"{lat},{lon}", "timesteps": "1h,1d", "apikey": self.api_key}
+        )
+        timelines = payload.get("timelines", {})
+        return {
+            "hourly": [
+                {"time": step["time"], "values": self._values(step.get("values", {}))}
+                for step in timelines.get("hourly", [])
+            ],
+            "daily": [
+                {"time": step["time"], "values": {
+                    "temperature_max": step.get("values", {}).get("temperatureMax", "N/A"),
+                    "temperature_min": step.get("values", {}).get("temperatureMin", "N/A"),
+                    "rain_probability_max": step.get("values", {}).get("precipitationProbabilityMax", "N/A"),
+                    "rain_sum": step.get("values", {}).get("rainAccumulationSum", "N/A")
+                }}
+                for step in timelines.get("daily", [])
+            ]
+        }
+
+    @staticmethod
+    def _values(data):
+        return {
+            "temperature": data.get("temperature", "N/A"),
+            "humidity": data.get("humidity", "N/A"),
+            "rain_probability": data.get("precipitationProbability", "N/A"),
+            "soil_moisture": data.get("soilMoistureVolumetric0To10cm", "N/A"),
+            "evapotranspiration": data.get("evapotranspiration", "N/A")
+        }
+
+
+# WEATHER_PROVIDERS names -> provider classes
+PROVIDER_TYPES = {
+    TomorrowIOProvider.name: TomorrowIOProvider,
+}
+
+
+class WeatherClient:
+    def __init__(self, timeout=None, retries=None, backoff=None, max_concurrency=None, max_connections=None):
+        self.timeout = WEATHER_HTTP_TIMEOUT_SECONDS if timeout is None else timeout
+        self.retries = WEATHER_HTTP_RETRIES if retries is None else retries
+        self.backoff = WEATHER_HTTP_BACKOFF_SECONDS if backoff is None else backoff
+        self.max_concurrency = max_concurrency or WEATHER_HTTP_MAX_CONCURRENCY
+        self.max_connections = max_connections or WEATHER_HTTP_MAX_CONNECTIONS
+        self._http = None
+        self._semaphore = None
+
+    def _session(self):
+        # Created lazily so both belong to the loop that uses them
+        if self._http is None:
+            self._http = httpx.AsyncClient(
+                timeout=self.timeout,
+                limits=httpx.Limits(
+                    max_connections=self.max_connections, max_keepalive_connections=self.max_connections
+                )
+            )
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._http, self._semaphore
+
+    async def get_json(self, url, params=None):
+        """GET a JSON document, retrying timeouts, connection errors, 429 and 5xx with exponential backoff."""
+        http, semaphore = self._session()
+        attempt = 0
+        while True:
+            try:
+                async with semaphore:
+                    response = await http.get(url, params=params)
+                if response.status_code in RETRY_STATUS_CODES and attempt < self.retries:
+                    delay = self._retry_delay(attempt, response.headers.get("Retry-After"))
+                else:
+                    response.raise_for_status()
+                    return response.json()
+            except (httpx.TimeoutException, httpx.TransportError):
+                if attempt >= self.retries:
+                    raise
+                delay = self._retry_delay(attempt)
+            attempt += 1
+            await asyncio.sleep(delay)
+
+    def _retry_delay(self, attempt, retry_after=None):
+        if retry_after:
+            try:
+                return min(float(retry_after), 30.0)
+            except ValueError:
+                pass
+        return self.backoff * (2 ** attempt) * (0.5 + random.random())
+
+    async def fetch_all(self, providers, lat, lon, method="fetch"):
+        """
+        Query every provider in parallel: provider name -> readings, or {'error': ...}.
+        method="fetch_forecast" collects forecasts instead of realtime readings.
+        """
+        async def one(provider):
+            try:
+                return await getattr(provider, method)(self, lat, lon)
+            except Exception as e:
+                return {"error": f"{provider.label} error: {str(e)}"}
+        readings = await asyncio.gather(*(one(provider) for provider in providers))
+        return {provider.name: values for provider, values in zip(providers, readings)}
+
+    async def aclose(self):
+        if self._http is not None:
+            await self._http.aclose()
+            self._http = None
+
+
+# ---- Background loop so synchronous report code can share one client
+
+_loop = None
+_loop_lock = threading.Lock()
+_client = WeatherClient()
+
+
+def _background_loop():
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            loop = asyncio.new_event_loop()
+            threading.Thread(target=loop.run_forever, name="weather-http", daemon=True).start()
+            _loop = loop
+    return _loop
+
+
+def run_sync(coro, timeout=None):
+    """Run a coroutine on the shared weather loop from any thread and wait for its result."""
+    return asyncio.run_coroutine_threadsafe(coro, _background_loop()).result(timeout)
+
+
+def build_providers(names, **settings):
+    """Provider instances for a comma separated WEATHER_PROVIDERS value; `settings` holds per-provider kwargs."""
+    providers = []
+    for name in (n.strip() for n in names.split(",")):
+        if not name:
+            continue
+        if name not in PROVIDER_TYPES:
+            raise ValueError(f"Unknown weather provider {name}")
+        providers.append(PROVIDER_TYPES[name](**settings.get(name, {})))
+    return providers
+
+
+def fetch_readings(providers, lat, lon, method="fetch"):
+    """Synchronous fan-out over `providers` through the shared pooled client."""
+    overall = _client.timeout * (_client.retries + 1) + 30
+    return run_sync(_client.fetch_all(providers, lat, lon, method), timeout=overall)
+
+
+def fetch_many(providers, points, method="fetch", concurrency=None):
+    """
+    fetch_readings for many (lat, lon) points, at most `concurrency` at a time,
+    through the shared pooled client. Returns readings in the order of `points`.
+    """
+    async def gather():
+        semaphore = asyncio.Semaphore(concurrency or _client.max_concurrency)
+
+        async def one(point):
+            async with semaphore:
+                return await _client.fetch_all(providers, *point, method)
+
+        return await asyncio.gather(*(one(point) for point in points))
+
+    return run_sync(gather())
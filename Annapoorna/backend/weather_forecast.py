@@ -0,0 +1,62 @@
+import os
+from datetime import datetime
+from database import profile_collection, forecast_collection
+from weather import weather_cell, cell_center, cell_key, parse_forecast_time, providers, weather_cache
+from weather_client import fetch_many
+
+# Forecast timelines are fetched once a day per occupied grid cell, shortly
+# before the report window, so reports read weather from MongoDB instead of
+# calling the provider. A failed cell keeps its previous forecast.
+WEATHER_PREFETCH_CONCURRENCY = int(os.environ.get("WEATHER_PREFETCH_CONCURRENCY", 5))
+# Start the prefetch this long before REPORT_WINDOW_START
+WEATHER_PREFETCH_LEAD_MINUTES = int(os.environ.get("WEATHER_PREFETCH_LEAD_MINUTES", 30))
+
+
+def occupied_cells():
+    """Weather grid cells containing at least one registered field's centre."""
+    cells = set()
+    for user in profile_collection.find({}, {"bounding_box": 1}):
+        bounding_box = user.get("bounding_box")
+        if not isinstance(bounding_box, list) or len(bounding_box) != 4:
+            continue
+        lat = (bounding_box[0] + bounding_box[1]) / 2
+        lon = (bounding_box[2] + bounding_box[3]) / 2
+        cells.add(weather_cell(lat, lon))
+    return sorted(cells)
+
+
+def _forecast_doc(cell, forecasts, fetched_at):
+    lat, lon = cell_center(cell)
+    stored = {}
+    for name, forecast in forecasts.items():
+        if "error" in forecast:
+            print(f"Forecast for cell {cell_key(cell)} failed: {forecast['error']}")
+            continue
+        stored[name] = {
+            "hourly": [{"time": parse_forecast_time(s["time"]), "values": s["values"]} for s in forecast["hourly"]],
+            "daily": [{"time": parse_forecast_time(s["time"]), "values": s["values"]} for s in forecast["daily"]],
+        }
+    if not stored:
+        return None
+    return {"_id": cell_key(cell), "cell": list(cell), "lat": lat, "lon": lon, "fetched_at": fetched_at, "providers": stored}
+
+
+def prefetch_forecasts(cells=None):
+    """Fetch and store the forecast of every occupied cell. Returns (stored, failed) cell counts."""
+    cells = occupied_cells() if cells is None else cells
+    started = datetime.now()
+    print(f"[{started}] Weather prefetch: {len(cells)} cells")
+    stored = failed = 0
+    points = [cell_center(cell) for cell in cells]
+    results = fetch_many(providers, points, method="fetch_forecast", concurrency=WEATHER_PREFETCH_CONCURRENCY)
+    for cell, forecasts in zip(cells, results):
+        doc = _forecast_doc(cell, forecasts, datetime.utcnow())
+        if doc is None:
+            failed += 1
+            continue
+        forecast_collection.replace_one({"_id": doc["_id"]}, doc, upsert=True)
+        stored += 1
+    # Reports after this point should read the fresh forecasts
+    weather_cache.clear()
+    print(f"Weather prefetch stored {stored} cells, {failed} failed, in {datetime.now() - started}")
+    return stored, failed
@@ -0,0 +1,96 @@
+"""
+Local stand-in for the Tomorrow.io realtime endpoint, for offline benchmarks.
+
+    python weather_stub_server.py --port 8765 --latency-ms 80 --jitter-ms 40 --error-rate 0.02
+
+then run the backend (or weather_benchmark.py) with
+TOMORROW_BASE_URL=http://127.0.0.1:8765.
+"""
+import argparse
+import json
+import random
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, so client connection pooling is exercised
+    latency_ms = 50.0
+    jitter_ms = 0.0
+    error_rate = 0.0
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path not in ("/v4/weather/realtime", "/v4/weather/forecast"):
+            self._send(404, {"message": "not found"})
+            return
+        time.sleep(max(0.0, self.latency_ms + random.uniform(-self.jitter_ms, self.jitter_ms)) / 1000)
+        if random.random() < self.error_rate:
+            self._send(503, {"message": "stub overload"})
+            return
+        location = parse_qs(url.query).get("location", ["0,0"])[0]
+        lat, lon = (float(part) for part in location.split(","))
+        if url.path == "/v4/weather/forecast":
+            self._send(200, {"timelines": {
+                "hourly": [
+                    {"time": self._time(hour * 3600), "values": self._values(lat, lon, hour)} for hour in range(120)
+                ],
+                "daily": [
+                    {"time": self._time(day * 86400), "values": {
+                        "temperatureMax": 33.0, "temperatureMin": 21.0,
+                        "precipitationProbabilityMax": (day * 25) % 100, "rainAccumulationSum": day * 1.5,
+                    }} for day in range(5)
+                ],
+            }, "location": {"lat": lat, "lon": lon}})
+            return
+        self._send(200, {"data": {"time": self._time(0), "values": self._values(lat, lon, 0)},
+                         "location": {"lat": lat, "lon": lon}})
+
+    @staticmethod
+    def _time(offset_seconds):
+        start = time.time() // 3600 * 3600
+        return time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(start + offset_seconds))
+
+    @staticmethod
+    def _values(lat, lon, hour):
+        return {
+            "temperature": round(25 + (lat % 1) * 5 + (hour % 24) / 4, 1),
+            "humidity": round(50 + (lon % 1) * 30),
+            "precipitationProbability": (hour * 5) % 100,
+            "soilMoistureVolumetric0To10cm": 0.21,
+            "evapotranspiration": 0.3,
+        }
+
+    def _send(self, status, body):
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency-ms", type=float, default=50.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    StubHandler.latency_ms = args.latency_ms
+    StubHandler.jitter_ms = args.jitter_ms
+    StubHandler.error_rate = args.error_rate
+    server = ThreadingHTTPServer((args.host, args.port), StubHandler)
+    server.daemon_threads = True
+    print(f"Weather stub listening on http://{args.host}:{args.port}")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
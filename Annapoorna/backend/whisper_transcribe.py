@@ -1,13 +1,26 @@
 from fastapi import APIRouter, UploadFile, File, Query
 from fastapi.responses import JSONResponse , FileResponse
-import whisper
 import os
 from datetime import datetime
 import shutil
 from typing import Optional
+import model_registry
 
 router = APIRouter()
-model = whisper.load_model("medium")
+
+MODEL_NAME = "whisper"
+WHISPER_MODEL_SIZE = os.environ.get("WHISPER_MODEL_SIZE", "medium")
+
+def _load_whisper_model():
+    import whisper
+    return whisper.load_model(WHISPER_MODEL_SIZE)
+
+def _unload_whisper_model(model):
+    import torch
+    if torch.cuda.is_available():
+        torch.cuda.empty_cache()
+
+model_registry.register(MODEL_NAME, _load_whisper_model, _unload_whisper_model)
 
 # Supported languages - restricted to Indian languages and English
 SUPPORTED_LANGUAGES = {
@@ -45,46 +58,48 @@ async def transcribe_audio(
         with open(temp_path, "wb") as buffer:
             shutil.copyfileobj(file.file, buffer)
 
-        # Configure transcription parameters
-        transcribe_options = {
-            "fp16": False,  # Better compatibility
-            "task": "transcribe"
-        }
+        import whisper
+        with model_registry.use(MODEL_NAME) as model:
+            # Configure transcription parameters
+            transcribe_options = {
+                "fp16": False,  # Better compatibility
+                "task": "transcribe"
+            }
         
-        # Handle language detection and restriction
-        if language == "auto":
-            # First detect language
-            audio = whisper.load_audio(temp_path)
-            audio = whisper.pad_or_trim(audio)
-            mel = whisper.log_mel_spectrogram(audio).to(model.device)
-            _, probs = model.detect_language(mel)
+            # Handle language detection and restriction
+            if language == "auto":
+                # First detect language
+                audio = whisper.load_audio(temp_path)
+                audio = whisper.pad_or_trim(audio)
+                mel = whisper.log_mel_spectrogram(audio).to(model.device)
+                _, probs = model.detect_language(mel)
             
-            # Filter probabilities to only include supported languages
-            filtered_probs = {lang: prob for lang, prob in probs.items() if lang in INDIAN_LANGUAGE_CODES}
+                # Filter probabilities to only include supported languages
+                filtered_probs = {lang: prob for lang, prob in probs.items() if lang in INDIAN_LANGUAGE_CODES}
             
-            if filtered_probs:
-                detected_lang = max(filtered_probs, key=filtered_probs.get)
-                # Additional check: if confidence is too low, default to Hindi
-                if filtered_probs[detected_lang] < 0.1:
-                    detected_lang = "hi"
-            else:
-                detected_lang = "hi"  # Default to Hindi if no supported language detected
+                if filtered_probs:
+                    detected_lang = max(filtered_probs, key=filtered_probs.get)
+                    # Additional check: if confidence is too low, default to Hindi
+                    if filtered_probs[detected_lang] < 0.1:
+                        detected_lang = "hi"
+                else:
+                    detected_lang = "hi"  # Default to Hindi if no supported language detected
             
-            transcribe_options["language"] = detected_lang
-        else:
-            # Force the specified language
-            transcribe_options["language"] = language
+                transcribe_options["language"] = detected_lang
+            else:
+                # Force the specified language
+                transcribe_options["language"] = language
 
-        # Perform transcription with language restriction
-        result = model.transcribe(temp_path, **transcribe_options)
-        
-        # Double-check the detected language and override if necessary
-        actual_detected_lang = result.get("language", transcribe_options["language"])
-        if actual_detected_lang not in INDIAN_LANGUAGE_CODES:
-            # Re-transcribe with forced Hindi if unsupported language detected
-            transcribe_options["language"] = "hi"
+            # Perform transcription with language restriction
             result = model.transcribe(temp_path, **transcribe_options)
-            actual_detected_lang = "hi"
+        
+            # Double-check the detected language and override if necessary
+            actual_detected_lang = result.get("language", transcribe_options["language"])
+            if actual_detected_lang not in INDIAN_LANGUAGE_CODES:
+                # Re-transcribe with forced Hindi if unsupported language detected
+                transcribe_options["language"] = "hi"
+                result = model.transcribe(temp_path, **transcribe_options)
+                actual_detected_lang = "hi"
         
         transcription = result["text"]
         detected_language = actual_detected_lang
@@ -17,6 +17,9 @@ const [activeChatId, setActiveChatId] = useState(null); // No default // Default
 
   const params=useParams();
   const id=params.id;
+  // Backend conversation session: the open saved chat, or this user's unsaved draft
+  const sessionId = activeChatId || "new";
+  const sessionQuery = `user_id=${encodeURIComponent(id)}&session_id=${encodeURIComponent(sessionId)}`;
   const [messages, setMessages] = useState([
     { type: "bot", text: "Hi, Annapoorna here! How may I help you?" },
   ]);
@@ -69,7 +72,7 @@ const changeChat = async (chat_id) => {
       headers: {
         "Content-Type": "application/json",
       },
-      body: JSON.stringify({ context: chat.context }),
+      body: JSON.stringify({ context: chat.context, user_id: id, session_id: chat_id }),
     });
   } catch (error) {
     console.error("Error:", error);
@@ -86,9 +89,12 @@ const changeChat = async (chat_id) => {
     setInput("");
     setImagePreview(null);
 
-    const botReply = await generateResponse(input.trim());
-    const botMessage = { type: "bot", text: botReply };
-    setMessages((prev) => [...prev, botMessage]);
+    // Show the reply as it streams in, updating the last bot message
+    setMessages((prev) => [...prev, { type: "bot", text: "" }]);
+    const botReply = await generateResponse(input.trim(), (text) =>
+      setMessages((prev) => [...prev.slice(0, -1), { type: "bot", text }])
+    );
+    setMessages((prev) => [...prev.slice(0, -1), { type: "bot", text: botReply }]);
   };
 
 
@@ -99,6 +105,7 @@ const changeChat = async (chat_id) => {
   ]);
   setImagePreview(null);
   setInput("");
+  setActiveChatId(null);
   // Step 2: Only fetch report if `id` is present
   if (!id) return;
 
@@ -107,7 +114,7 @@ const changeChat = async (chat_id) => {
 
     if (response.data && response.data.report) {
       // Step 3: Set context based on fetched report
-      setContext(response.data.report);
+      setContext(response.data.digest || response.data.report);
     } else {
       setContext('');
     }
@@ -129,7 +136,7 @@ const changeChat = async (chat_id) => {
     formData.append("file", file);
 
     try {
-      const res = await fetch("http://localhost:8000/predict", {
+      const res = await fetch(`http://localhost:8000/predict?${sessionQuery}`, {
         method: "POST",
         body: formData,
       });
@@ -148,14 +155,35 @@ const changeChat = async (chat_id) => {
 
 
 
-  async function generateResponse(userInput) {
+  async function generateResponse(userInput, onText) {
   try {
     const input = userInput || "Explain";
-    const response = await fetch(`http://localhost:8000/chat/${encodeURIComponent(input)}`, {
+    const response = await fetch(`http://localhost:8000/chatStream/${encodeURIComponent(input)}?${sessionQuery}`, {
       method: "POST"
     });
-    const data = await response.json();
-    return data.response; // this should be the bot's reply
+    // Server-sent events: {"token"} data events, then "done" (or "error")
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffered = "";
+    let text = "";
+    while (true) {
+      const { value, done } = await reader.read();
+      if (done) break;
+      buffered += decoder.decode(value, { stream: true });
+      const events = buffered.split("\n\n");
+      buffered = events.pop();
+      for (const event of events) {
+        const dataLine = event.split("\n").find((line) => line.startsWith("data: "));
+        if (!dataLine) continue;
+        const data = JSON.parse(dataLine.slice(6));
+        if (event.startsWith("event: error")) throw new Error(data.error);
+        if (data.token) {
+          text += data.token;
+          onText?.(text);
+        }
+      }
+    }
+    return text.trim(); // this should be the bot's reply
   } catch (error) {
     console.error("Error:", error);
     return "Sorry, something went wrong.";
@@ -171,6 +199,7 @@ async function clearChat() {
       },
       body: JSON.stringify({
         user_id: id,
+        session_id: "new",
         messages: messages,
         context: context,
       }),